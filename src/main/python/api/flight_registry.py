@@ -0,0 +1,72 @@
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+from api.state_store import MemoryStateStore
+
+class FlightRegistry:
+    """Coalesces identical concurrent jobs into one in-flight computation
+
+    A flight is one scheduler job, keyed by the session that started it,
+    plus every session attached to it. Its progress and results are
+    delivered to all attached sessions, so Whisper and ChatGPT are called
+    once. A cancelled session detaches; the job itself is only cancelled
+    when its last session leaves.
+
+    Flights are kept in the state store. With the SQLite backend, a request
+    on any worker can attach to a job running on another; the worker that
+    owns the job delivers its results to every attached session.
+    """
+
+    def __init__(self, store: MemoryStateStore):
+        self.store = store
+        # Sessions this worker attached to an existing flight
+        self.coalesced = 0
+
+    @staticmethod
+    def flight_key(content_sha256: str, **params: Any) -> str:
+        """Key identical work: same audio content and same pipeline parameters"""
+        payload = json.dumps([content_sha256, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def join(self, key: str, session_id: str) -> Optional[str]:
+        """
+        Attach a session to the flight for key, starting one if none is in flight
+
+        Returns:
+            Job ID of the flight the session joined, or None if the session
+            started a new flight (its job ID is then the session ID)
+        """
+        job_id = await self.store.join_flight(key, session_id)
+        if job_id is not None:
+            self.coalesced += 1
+        return job_id
+
+    async def job_id(self, session_id: str) -> str:
+        """Job computing this session's result (the session itself if not coalesced)"""
+        return await self.store.flight_of(session_id) or session_id
+
+    async def sessions(self, job_id: str) -> List[str]:
+        """Sessions receiving a job's progress and results"""
+        return await self.store.flight_sessions(job_id) or [job_id]
+
+    async def leave(self, session_id: str) -> bool:
+        """
+        Detach a session from its flight if other sessions still share it
+
+        Returns:
+            False if the session is not in a flight or is its last member,
+            in which case the job itself should be cancelled
+        """
+        return await self.store.leave_flight(session_id)
+
+    async def finish(self, job_id: str):
+        """Close a flight once its job has ended; later identical jobs start a new one"""
+        await self.store.finish_flight(job_id)
+
+    async def stats(self) -> Dict[str, int]:
+        in_flight, attached = await self.store.flight_counts()
+        return {
+            "in_flight": in_flight,
+            "attached_sessions": attached,
+            "coalesced": self.coalesced
+        }
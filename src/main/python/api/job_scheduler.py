@@ -0,0 +1,163 @@
+import asyncio
+import itertools
+from typing import Dict, Any, Optional, Callable, Awaitable, List, Tuple
+from models.schemas import JobPriority
+
+PRIORITY_ORDER = {JobPriority.INTERACTIVE: 0, JobPriority.BATCH: 1}
+
+class JobScheduler:
+    """Runs processing jobs with bounded concurrency and priority classes
+
+    Queued interactive jobs always start before queued batch jobs; within a
+    class jobs run in submission order. Queued and running jobs can be
+    cancelled; cancelling a running job cancels its task, which aborts any
+    in-flight OpenAI request it is awaiting.
+    """
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+        # job_id -> (priority, sequence of its live heap entry)
+        self._queued: Dict[str, Tuple[JobPriority, int]] = {}
+        self._factories: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self.completed = 0
+        self.cancelled = 0
+
+    async def start(self):
+        if self._workers:
+            return
+        self._stopping = False
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.max_concurrent)
+        ]
+
+    async def stop(self):
+        self._stopping = True
+        for task in list(self._running.values()) + self._workers:
+            task.cancel()
+        await asyncio.gather(*self._running.values(), *self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(
+        self,
+        job_id: str,
+        job_factory: Callable[[], Awaitable[Any]],
+        priority: JobPriority = JobPriority.INTERACTIVE
+    ) -> bool:
+        """
+        Queue a job
+
+        Args:
+            job_id: Unique job identifier (the session ID)
+            job_factory: Zero-argument callable returning the job coroutine
+            priority: Priority class
+
+        Returns:
+            False if the job is already queued or running
+        """
+        if self.is_active(job_id):
+            return False
+        sequence = next(self._sequence)
+        self._queued[job_id] = (priority, sequence)
+        self._factories[job_id] = job_factory
+        self._queue.put_nowait((PRIORITY_ORDER[priority], sequence, job_id))
+        return True
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a queued or running job
+
+        Returns:
+            "queued" or "running" depending on where the job was, or None if
+            this scheduler does not know the job
+        """
+        if job_id in self._queued:
+            # The heap entry is skipped when a worker pops it
+            del self._queued[job_id]
+            del self._factories[job_id]
+            self.cancelled += 1
+            return "queued"
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            self.cancelled += 1
+            return "running"
+        return None
+
+    def raise_priority(self, job_id: str, priority: JobPriority) -> bool:
+        """
+        Move a queued job up to a higher priority class
+
+        The job keeps its submission order within the new class. Running
+        jobs and jobs already at or above priority are left alone.
+
+        Returns:
+            True if the job was moved
+        """
+        queued = self._queued.get(job_id)
+        if queued is None or PRIORITY_ORDER[priority] >= PRIORITY_ORDER[queued[0]]:
+            return False
+        sequence = queued[1]
+        self._queued[job_id] = (priority, sequence)
+        # The old heap entry is skipped once the job has been started from this one
+        self._queue.put_nowait((PRIORITY_ORDER[priority], sequence, job_id))
+        return True
+
+    def queued_jobs(self) -> List[str]:
+        """IDs of jobs waiting to start"""
+        return list(self._queued)
+
+    def is_active(self, job_id: str) -> bool:
+        return job_id in self._queued or job_id in self._running
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """1-based position among queued jobs, in the order they will start"""
+        if job_id not in self._queued:
+            return None
+        ordered = sorted(
+            self._queued,
+            key=lambda queued_id: (PRIORITY_ORDER[self._queued[queued_id][0]], self._queued[queued_id][1])
+        )
+        return ordered.index(job_id) + 1
+
+    async def _worker(self):
+        # Checking _stopping matters when a job absorbs the cancellation stop()
+        # sends (e.g. asyncio.wait_for on Python 3.11 when its inner call finishes
+        # at the same moment): the worker then sees a normal return, not CancelledError
+        while not self._stopping:
+            _, sequence, job_id = await self._queue.get()
+            if job_id not in self._queued or self._queued[job_id][1] != sequence:
+                continue  # Cancelled (or cancelled and resubmitted) while queued
+
+            del self._queued[job_id]
+            task = asyncio.create_task(self._factories.pop(job_id)())
+            self._running[job_id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                # Only a job cancelled through cancel() is absorbed; when the
+                # scheduler is stopping, the worker must exit too
+                if self._stopping or not task.cancelled():
+                    raise
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+            finally:
+                self._running.pop(job_id, None)
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        queued_by_priority = {priority.value: 0 for priority in JobPriority}
+        for priority, _ in self._queued.values():
+            queued_by_priority[priority.value] += 1
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": len(self._running),
+            "queued": queued_by_priority,
+            "completed": self.completed,
+            "cancelled": self.cancelled
+        }
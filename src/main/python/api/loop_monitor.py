@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class LoopLagMonitor:
+    """Detects event loop stalls and reports the call sites responsible
+
+    A heartbeat coroutine wakes up every ``interval`` seconds and measures how
+    late it was scheduled. A watchdog thread notices when the heartbeat is
+    overdue and samples the loop thread's stack while the stall is still in
+    progress, so the blocking call site can be attributed.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, max_records: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=max_records)
+        self.call_sites: Dict[str, Dict[str, Any]] = {}
+        self.stall_count = 0
+        self.total_stall_seconds = 0.0
+        self.max_stall_seconds = 0.0
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._sampled_stack: Optional[List[traceback.FrameSummary]] = None
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop monitoring"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = now - expected
+            self._last_beat = now
+            if lag >= self.threshold:
+                self._record(lag, self._sampled_stack)
+            self._sampled_stack = None
+
+    def _watch(self):
+        # Poll faster than the threshold so the stack is sampled mid-stall
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue >= self.threshold and self._sampled_stack is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._sampled_stack = traceback.extract_stack(frame)
+
+    def _record(self, lag: float, stack: Optional[List[traceback.FrameSummary]]):
+        call_site = self._call_site(stack)
+        self.stall_count += 1
+        self.total_stall_seconds += lag
+        self.max_stall_seconds = max(self.max_stall_seconds, lag)
+        self.stalls.append({
+            "at": datetime.now().isoformat(),
+            "duration_ms": round(lag * 1000, 1),
+            "call_site": call_site,
+            "stack": [f"{f.filename}:{f.lineno} in {f.name}" for f in (stack or [])[-8:]]
+        })
+
+        site = self.call_sites.setdefault(
+            call_site, {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+        site["count"] += 1
+        site["total_ms"] = round(site["total_ms"] + lag * 1000, 1)
+        site["max_ms"] = max(site["max_ms"], round(lag * 1000, 1))
+
+    @staticmethod
+    def _call_site(stack: Optional[List[traceback.FrameSummary]]) -> str:
+        """Pick the innermost application frame, falling back to the innermost frame"""
+        if not stack:
+            return "unknown"
+        for frame in reversed(stack):
+            if frame.filename.startswith(APP_DIR) and frame.filename != __file__:
+                return f"{os.path.relpath(frame.filename, APP_DIR)}:{frame.lineno} in {frame.name}"
+        frame = stack[-1]
+        return f"{frame.filename}:{frame.lineno} in {frame.name}"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return stall statistics for the metrics endpoint"""
+        top_sites = sorted(
+            self.call_sites.items(), key=lambda item: item[1]["total_ms"], reverse=True
+        )
+        return {
+            "running": self._task is not None,
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "stall_count": self.stall_count,
+            "total_stall_ms": round(self.total_stall_seconds * 1000, 1),
+            "max_stall_ms": round(self.max_stall_seconds * 1000, 1),
+            "call_sites": [{"call_site": site, **stats} for site, stats in top_sites[:20]],
+            "recent_stalls": list(self.stalls)[-20:]
+        }
@@ -1,47 +1,164 @@
 from fastapi import WebSocket
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Sequence, Tuple, Callable, Awaitable, List, Set
 import json
+import time
 import asyncio
 from models.schemas import ProcessingStatus, ProgressUpdate
+from api.state_store import MemoryStateStore
+
+class _Connection:
+    """Bookkeeping for one WebSocket connection"""
+    
+    __slots__ = ("session_id", "client_ip", "last_active")
+    
+    def __init__(self, session_id: str, client_ip: str):
+        self.session_id = session_id
+        self.client_ip = client_ip
+        self.last_active = time.monotonic()
 
 class ProgressManager:
-    """Manages session progress and WebSocket connections"""
+    """Manages session progress and WebSocket connections
     
-    def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
-        self.connections: Dict[str, WebSocket] = {}
+    Session data and progress events go through a state store, so with a
+    shared store any worker can serve any session's requests and WebSocket.
+    WebSocket connections themselves are always local to this process.
     
-    def create_session(self, session_id: str, data: Dict[str, Any]):
+    A session may have any number of subscribers. Connections are limited
+    globally and per client IP, and connections with no traffic in either
+    direction for idle_timeout_s are closed. Dead peers that never send a
+    close frame are detected by the server's protocol-level pings (uvicorn
+    ws_ping_interval / ws_ping_timeout).
+    """
+    
+    def __init__(
+        self,
+        store=None,
+        max_connections: int = 10000,
+        max_connections_per_ip: int = 50,
+        idle_timeout_s: float = 900.0,
+        send_timeout_s: float = 5.0
+    ):
+        self.store = store or MemoryStateStore()
+        self.connections: Dict[str, Set[WebSocket]] = {}
+        self.sockets: Dict[WebSocket, _Connection] = {}
+        self.connections_per_ip: Dict[str, int] = {}
+        self.max_connections = max_connections
+        self.max_connections_per_ip = max_connections_per_ip
+        self.idle_timeout_s = idle_timeout_s
+        self.send_timeout_s = send_timeout_s
+        self.rejected = 0
+        self.idle_closed = 0
+        self.send_failures = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self.control_handlers: List[Callable[[str, Dict[str, Any]], Awaitable[None]]] = []
+        self.store.subscribe(self._on_event)
+    
+    async def start(self):
+        """Start receiving events published by other workers and sweeping idle sockets"""
+        await self.store.start()
+        if self._sweeper is None and self.idle_timeout_s > 0:
+            self._sweeper = asyncio.create_task(self._sweep_idle())
+    
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        await self.store.stop()
+    
+    async def create_session(self, session_id: str, data: Dict[str, Any]):
         """Create a new session"""
-        self.sessions[session_id] = data
+        await self.store.create(session_id, data)
     
-    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session data"""
-        return self.sessions.get(session_id)
+        return await self.store.get(session_id)
     
-    def update_session(self, session_id: str, data: Dict[str, Any]):
-        """Update session data"""
-        if session_id in self.sessions:
-            self.sessions[session_id].update(data)
+    async def claim_session(self, session_id: str, statuses: Sequence[str], data: Dict[str, Any]) -> bool:
+        """
+        Atomically update a session if its status is one of statuses
+
+        Returns:
+            False if the session is missing or another request changed its status first
+        """
+        return await self.store.update_if_status(session_id, statuses, data)
     
-    async def connect(self, websocket: WebSocket, session_id: str):
-        """Accept WebSocket connection"""
+    async def get_session_field(self, session_id: str, field: str) -> Any:
+        """Get one field of a session without loading the rest"""
+        return await self.store.get_field(session_id, field)
+    
+    async def update_session(self, session_id: str, data: Dict[str, Any]):
+        """Update session data and bump its version"""
+        await self.store.update(session_id, data)
+    
+    async def iter_sessions(self, include_large: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        All sessions as (session_id, data)
+        
+        Args:
+            include_large: Whether to load transcripts, segments and summaries
+        """
+        return await self.store.items(include_large)
+    
+    async def connect(self, websocket: WebSocket, session_id: str) -> bool:
+        """
+        Accept a WebSocket connection unless a connection limit is reached
+        
+        Returns:
+            False if the connection was refused
+        """
+        client_ip = websocket.client.host if websocket.client else "unknown"
+        if (
+            len(self.sockets) >= self.max_connections
+            or self.connections_per_ip.get(client_ip, 0) >= self.max_connections_per_ip
+        ):
+            self.rejected += 1
+            # Closing before the handshake completes makes the server answer HTTP 403;
+            # accept first so the client sees close code 1013 (try again later)
+            await websocket.accept()
+            await self._close(websocket, code=1013)
+            return False
+        
         await websocket.accept()
-        self.connections[session_id] = websocket
+        self.sockets[websocket] = _Connection(session_id, client_ip)
+        self.connections.setdefault(session_id, set()).add(websocket)
+        self.connections_per_ip[client_ip] = self.connections_per_ip.get(client_ip, 0) + 1
+        
+        # Send current status to the new subscriber if session exists
+        session_data = await self.get_session(session_id)
+        if session_data:
+            update = ProgressUpdate(
+                session_id=session_id,
+                status=session_data.get("status", ProcessingStatus.PENDING),
+                progress_percentage=0,
+                message="連接成功"
+            )
+            await self._send(websocket, update.model_dump_json())
+        return True
+    
+    def disconnect(self, websocket: WebSocket):
+        """Remove WebSocket connection (safe to call more than once)"""
+        connection = self.sockets.pop(websocket, None)
+        if connection is None:
+            return
         
-        # Send current status if session exists
-        if session_id in self.sessions:
-            session_data = self.sessions[session_id]
-            await self.send_progress(session_id, {
-                "status": session_data.get("status", ProcessingStatus.PENDING),
-                "progress_percentage": 0,
-                "message": "連接成功"
-            })
-    
-    def disconnect(self, session_id: str):
-        """Remove WebSocket connection"""
-        if session_id in self.connections:
-            del self.connections[session_id]
+        subscribers = self.connections.get(connection.session_id)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.connections[connection.session_id]
+        
+        remaining = self.connections_per_ip[connection.client_ip] - 1
+        if remaining:
+            self.connections_per_ip[connection.client_ip] = remaining
+        else:
+            del self.connections_per_ip[connection.client_ip]
+    
+    def touch(self, websocket: WebSocket):
+        """Record client activity on a connection"""
+        connection = self.sockets.get(websocket)
+        if connection is not None:
+            connection.last_active = time.monotonic()
     
     async def update_progress(
         self, 
@@ -49,54 +166,114 @@ class ProgressManager:
         status: ProcessingStatus, 
         progress: int, 
         message: str = "",
-        data: Optional[Dict[str, Any]] = None
+        data: Optional[Dict[str, Any]] = None,
+        eta_seconds: Optional[float] = None
     ):
-        """Update progress and notify connected clients"""
+        """Update progress and notify connected clients on every worker"""
         
         # Update session data
-        if session_id in self.sessions:
-            self.sessions[session_id].update({
-                "status": status,
-                "progress": progress,
-                "message": message
-            })
-            if data:
-                self.sessions[session_id].update(data)
+        await self.store.update(session_id, {
+            "status": status,
+            "progress": progress,
+            "message": message,
+            "eta_seconds": eta_seconds,
+            **(data or {})
+        })
         
-        # Send update via WebSocket
-        await self.send_progress(session_id, {
+        # Publish; each worker forwards it to its own WebSocket connections
+        await self.store.publish(session_id, "progress", {
             "status": status,
             "progress_percentage": progress,
             "message": message,
+            "eta_seconds": eta_seconds,
             "data": data
         })
     
+    def on_control(self, handler: Callable[[str, Dict[str, Any]], Awaitable[None]]):
+        """Register a handler for control messages (e.g. cancel) from any worker"""
+        self.control_handlers.append(handler)
+    
+    async def publish_control(self, session_id: str, payload: Dict[str, Any]):
+        """Send a control message to every worker, including this one"""
+        await self.store.publish(session_id, "control", payload)
+    
+    async def _on_event(self, session_id: str, kind: str, payload: Dict[str, Any]):
+        if kind == "progress":
+            await self.send_progress(session_id, payload)
+        elif kind == "control":
+            for handler in self.control_handlers:
+                await handler(session_id, payload)
+    
     async def send_progress(self, session_id: str, progress_data: Dict[str, Any]):
-        """Send progress update via WebSocket"""
-        if session_id in self.connections:
-            try:
-                update = ProgressUpdate(
-                    session_id=session_id,
-                    **progress_data
-                )
-                await self.connections[session_id].send_text(update.model_dump_json())
-            except Exception as e:
-                print(f"Failed to send progress update: {e}")
-                # Remove broken connection
-                self.disconnect(session_id)
-    
-    def cleanup_session(self, session_id: str):
+        """Send progress update to every WebSocket subscribed to the session"""
+        subscribers = self.connections.get(session_id)
+        if not subscribers:
+            return
+        
+        try:
+            message = ProgressUpdate(session_id=session_id, **progress_data).model_dump_json()
+        except Exception as e:
+            print(f"Failed to build progress update: {e}")
+            return
+        
+        # Serialize once, send concurrently; one slow client cannot hold up the rest
+        await asyncio.gather(*(self._send(websocket, message) for websocket in list(subscribers)))
+    
+    async def _send(self, websocket: WebSocket, message: str):
+        try:
+            await asyncio.wait_for(websocket.send_text(message), self.send_timeout_s)
+        except Exception as e:
+            print(f"Failed to send progress update: {e}")
+            self.send_failures += 1
+            # Remove broken or stalled connection
+            self.disconnect(websocket)
+            await self._close(websocket, code=1011)
+            return
+        self.touch(websocket)
+    
+    async def _close(self, websocket: WebSocket, code: int = 1000):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), self.send_timeout_s)
+        except Exception:
+            pass
+    
+    async def _sweep_idle(self):
+        """Close connections without traffic for idle_timeout_s"""
+        interval = min(self.idle_timeout_s / 4, 30.0)
+        while True:
+            await asyncio.sleep(interval)
+            cutoff = time.monotonic() - self.idle_timeout_s
+            idle = [
+                websocket for websocket, connection in self.sockets.items()
+                if connection.last_active < cutoff
+            ]
+            for websocket in idle:
+                self.disconnect(websocket)
+            self.idle_closed += len(idle)
+            await asyncio.gather(*(self._close(websocket, code=1001) for websocket in idle))
+    
+    def connection_stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.sockets),
+            "sessions": len(self.connections),
+            "client_ips": len(self.connections_per_ip),
+            "max_connections": self.max_connections,
+            "max_connections_per_ip": self.max_connections_per_ip,
+            "rejected": self.rejected,
+            "idle_closed": self.idle_closed,
+            "send_failures": self.send_failures
+        }
+    
+    async def cleanup_session(self, session_id: str):
         """Clean up session data and connections"""
-        if session_id in self.sessions:
+        session_data = await self.store.delete(session_id)
+        if session_data and "file_path" in session_data:
             # Delete uploaded file if exists
-            session_data = self.sessions[session_id]
-            if "file_path" in session_data:
-                try:
-                    import os
-                    os.remove(session_data["file_path"])
-                except:
-                    pass
-            
-            del self.sessions[session_id]
+            try:
+                import os
+                os.remove(session_data["file_path"])
+            except:
+                pass
         
-        self.disconnect(session_id)
\ No newline at end of file
+        for websocket in list(self.connections.get(session_id, ())):
+            self.disconnect(websocket)
\ No newline at end of file
@@ -0,0 +1,516 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, List, Sequence, Set
+
+EventCallback = Callable[[str, str, Dict[str, Any]], Awaitable[None]]
+
+# Bulky fields that are written once or twice per job. The SQLite store keeps
+# them apart from the rest of the session so progress updates stay small.
+LARGE_FIELDS = ("transcript", "segments", "summary")
+
+# Job results. Updating any of them also bumps the session's content_version,
+# so clients can cache results across progress-only updates.
+CONTENT_FIELDS = LARGE_FIELDS + ("tags", "routing", "obsidian_uri")
+
+def bump_versions(session: Dict[str, Any], data: Dict[str, Any]):
+    """Bump version on every update and content_version when a job result changes"""
+    session["version"] = session.get("version", 0) + 1
+    if any(field in data for field in CONTENT_FIELDS):
+        session["content_version"] = session.get("content_version", 0) + 1
+
+class MemoryStateStore:
+    """Session state, progress events and file pins held in this process only
+
+    Suitable for a single uvicorn worker (the default).
+    """
+
+    def __init__(self):
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        # path -> pin timestamps
+        self.pins: Dict[str, List[float]] = {}
+        # Coalesced jobs: flight key -> job ID, job ID -> attached session IDs in attach order
+        self.flight_jobs: Dict[str, str] = {}
+        self.flight_members: Dict[str, List[str]] = {}
+        self._subscribers: List[EventCallback] = []
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        self.sessions[session_id] = {**data, "version": 1, "content_version": 1}
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.sessions.get(session_id)
+
+    async def get_field(self, session_id: str, field: str) -> Any:
+        """One field of a session (None if the session or field is missing)"""
+        return (self.sessions.get(session_id) or {}).get(field)
+
+    async def update(self, session_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge data into a session and bump its versions"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        session.update(data)
+        bump_versions(session, data)
+        return session
+
+    async def update_if_status(self, session_id: str, statuses: Sequence[str], data: Dict[str, Any]) -> bool:
+        """
+        Merge data into a session only if its status is one of statuses
+
+        The check and the update are one atomic step, so of several
+        concurrent callers (on any worker) at most one succeeds.
+
+        Returns:
+            True if the session was updated
+        """
+        session = self.sessions.get(session_id)
+        if session is None or session.get("status") not in statuses:
+            return False
+        session.update(data)
+        bump_versions(session, data)
+        return True
+
+    async def delete(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.sessions.pop(session_id, None)
+
+    async def items(self, include_large: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        All sessions
+
+        Args:
+            include_large: Whether to load LARGE_FIELDS (stores may skip them when False)
+        """
+        return list(self.sessions.items())
+
+    async def pin(self, path: str):
+        """Protect a file from eviction by any worker"""
+        self.pins.setdefault(path, []).append(time.time())
+
+    async def unpin(self, path: str):
+        pins = self.pins.get(path)
+        if pins:
+            pins.pop(0)
+            if not pins:
+                del self.pins[path]
+
+    async def pinned(self, max_age: float) -> Set[str]:
+        """Paths with a pin younger than max_age seconds (older pins were leaked by a dead worker)"""
+        cutoff = time.time() - max_age
+        return {path for path, pins in self.pins.items() if pins[-1] > cutoff}
+
+    async def join_flight(self, key: str, session_id: str) -> Optional[str]:
+        """
+        Attach a session to the flight for key, starting one if none is in flight
+
+        Returns:
+            Job ID of the flight joined, or None if the session started it
+        """
+        job_id = self.flight_jobs.get(key)
+        if job_id is None:
+            self.flight_jobs[key] = session_id
+            self.flight_members[session_id] = [session_id]
+            return None
+        self.flight_members[job_id].append(session_id)
+        return job_id
+
+    async def flight_of(self, session_id: str) -> Optional[str]:
+        """Job ID of the flight a session is attached to"""
+        for job_id, members in self.flight_members.items():
+            if session_id in members:
+                return job_id
+        return None
+
+    async def flight_sessions(self, job_id: str) -> List[str]:
+        return list(self.flight_members.get(job_id, []))
+
+    async def leave_flight(self, session_id: str) -> bool:
+        """Detach a session unless it is its flight's last member"""
+        job_id = await self.flight_of(session_id)
+        if job_id is None or len(self.flight_members[job_id]) <= 1:
+            return False
+        self.flight_members[job_id].remove(session_id)
+        return True
+
+    async def finish_flight(self, job_id: str):
+        self.flight_members.pop(job_id, None)
+        for key, owner in list(self.flight_jobs.items()):
+            if owner == job_id:
+                del self.flight_jobs[key]
+
+    async def flight_counts(self) -> Tuple[int, int]:
+        """(flights in progress, sessions attached to them)"""
+        return len(self.flight_members), sum(len(members) for members in self.flight_members.values())
+
+    def subscribe(self, callback: EventCallback):
+        self._subscribers.append(callback)
+
+    async def publish(self, session_id: str, kind: str, payload: Dict[str, Any]):
+        await self._dispatch(session_id, kind, payload)
+
+    async def _dispatch(self, session_id: str, kind: str, payload: Dict[str, Any]):
+        for callback in self._subscribers:
+            try:
+                await callback(session_id, kind, payload)
+            except Exception as e:
+                print(f"State event handler failed: {e}")
+
+class SQLiteStateStore(MemoryStateStore):
+    """Session state, progress events and file pins shared by all local worker processes
+
+    Sessions live in a SQLite database in WAL mode, so readers never block
+    the single writer. Published events are appended to an ``events`` table
+    that every process polls; events are delivered to the publishing process
+    immediately and to the other workers within one poll interval. This lets
+    an upload, its processing request and its WebSocket land on different
+    workers without any outside service.
+
+    All database calls run on one dedicated thread, so lock waits (up to the
+    30 s busy timeout when workers contend) never block the event loop.
+    LARGE_FIELDS are stored in their own table and only rewritten when they
+    change, so a progress update rewrites a small JSON document.
+    """
+
+    def __init__(self, db_path: str, poll_interval: float = 0.1, event_retention: float = 600):
+        super().__init__()
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.event_retention = event_retention
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS session_fields (
+                session_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (session_id, field)
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at);
+            CREATE TABLE IF NOT EXISTS pins (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_pins_path ON pins(path);
+            CREATE TABLE IF NOT EXISTS flights (
+                key TEXT PRIMARY KEY,
+                job_id TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS flight_members (
+                session_id TEXT PRIMARY KEY,
+                job_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_flight_members_job ON flight_members(job_id);
+        """)
+        # Only deliver events published after this process started
+        row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+        self._last_event_id = row[0]
+        self._poller: Optional[asyncio.Task] = None
+
+    async def _run(self, func: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def start(self):
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll_events())
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        await self._run(self._create, session_id, {**data, "version": 1, "content_version": 1})
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._get, session_id)
+
+    async def get_field(self, session_id: str, field: str) -> Any:
+        return await self._run(self._get_field, session_id, field)
+
+    async def update(self, session_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Atomically merge data into a session and bump its versions"""
+        return await self._run(self._update, session_id, data)
+
+    async def update_if_status(self, session_id: str, statuses: Sequence[str], data: Dict[str, Any]) -> bool:
+        return await self._run(self._update, session_id, data, list(statuses)) is not None
+
+    async def delete(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._delete, session_id)
+
+    async def items(self, include_large: bool = True) -> List[Tuple[str, Dict[str, Any]]]:
+        return await self._run(self._items, include_large)
+
+    async def pin(self, path: str):
+        await self._run(self._execute, "INSERT INTO pins (path, created_at) VALUES (?, ?)", (path, time.time()))
+
+    async def unpin(self, path: str):
+        await self._run(
+            self._execute,
+            "DELETE FROM pins WHERE id = (SELECT MIN(id) FROM pins WHERE path = ?)", (path,)
+        )
+
+    async def pinned(self, max_age: float) -> Set[str]:
+        rows = await self._run(
+            self._fetchall, "SELECT DISTINCT path FROM pins WHERE created_at > ?", (time.time() - max_age,)
+        )
+        return {path for (path,) in rows}
+
+    async def join_flight(self, key: str, session_id: str) -> Optional[str]:
+        return await self._run(self._join_flight, key, session_id)
+
+    async def flight_of(self, session_id: str) -> Optional[str]:
+        rows = await self._run(
+            self._fetchall, "SELECT job_id FROM flight_members WHERE session_id = ?", (session_id,)
+        )
+        return rows[0][0] if rows else None
+
+    async def flight_sessions(self, job_id: str) -> List[str]:
+        rows = await self._run(
+            self._fetchall, "SELECT session_id FROM flight_members WHERE job_id = ? ORDER BY rowid", (job_id,)
+        )
+        return [session_id for (session_id,) in rows]
+
+    async def leave_flight(self, session_id: str) -> bool:
+        return await self._run(self._leave_flight, session_id)
+
+    async def finish_flight(self, job_id: str):
+        await self._run(self._finish_flight, job_id)
+
+    async def flight_counts(self) -> Tuple[int, int]:
+        rows = await self._run(
+            self._fetchall, "SELECT COUNT(DISTINCT job_id), COUNT(*) FROM flight_members", ()
+        )
+        return rows[0]
+
+    async def publish(self, session_id: str, kind: str, payload: Dict[str, Any]):
+        await self._run(
+            self._execute,
+            "INSERT INTO events (session_id, kind, payload, origin, created_at) VALUES (?, ?, ?, ?, ?)",
+            (session_id, kind, self._encode(payload), self.origin, time.time())
+        )
+        # Local subscribers do not wait for the next poll
+        await self._dispatch(session_id, kind, payload)
+
+    async def _poll_events(self):
+        last_prune = time.time()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await self._run(
+                    self._fetchall,
+                    "SELECT id, session_id, kind, payload, origin FROM events WHERE id > ? ORDER BY id",
+                    (self._last_event_id,)
+                )
+                for event_id, session_id, kind, payload, origin in rows:
+                    self._last_event_id = event_id
+                    if origin != self.origin:
+                        await self._dispatch(session_id, kind, json.loads(payload))
+
+                if time.time() - last_prune > self.event_retention:
+                    last_prune = time.time()
+                    await self._run(
+                        self._execute,
+                        "DELETE FROM events WHERE created_at < ?",
+                        (time.time() - self.event_retention,)
+                    )
+            except Exception as e:
+                print(f"State event polling failed: {e}")
+
+    # The methods below run on the store thread
+
+    def _execute(self, sql: str, params: Tuple = ()):
+        self._conn.execute(sql, params)
+
+    def _fetchall(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        return self._conn.execute(sql, params).fetchall()
+
+    def _write_large_fields(self, session_id: str, data: Dict[str, Any]):
+        for field in LARGE_FIELDS:
+            if field in data:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO session_fields (session_id, field, value) VALUES (?, ?, ?)",
+                    (session_id, field, self._encode(data[field]))
+                )
+
+    def _read_large_fields(self, session_id: str) -> Dict[str, Any]:
+        rows = self._conn.execute(
+            "SELECT field, value FROM session_fields WHERE session_id = ?", (session_id,)
+        ).fetchall()
+        return {field: json.loads(value) for field, value in rows}
+
+    @staticmethod
+    def _small_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in data.items() if key not in LARGE_FIELDS}
+
+    def _create(self, session_id: str, data: Dict[str, Any]):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("DELETE FROM session_fields WHERE session_id = ?", (session_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, version, updated_at) VALUES (?, ?, 1, ?)",
+                (session_id, self._encode(self._small_fields(data)), time.time())
+            )
+            self._write_large_fields(session_id, data)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self._get_small(session_id)
+        if session is None:
+            return None
+        return {**session, **self._read_large_fields(session_id)}
+
+    def _get_field(self, session_id: str, field: str) -> Any:
+        if field not in LARGE_FIELDS:
+            session = self._get_small(session_id)
+            return session.get(field) if session else None
+        row = self._conn.execute(
+            "SELECT value FROM session_fields WHERE session_id = ? AND field = ?", (session_id, field)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _get_small(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _update(
+        self, session_id: str, data: Dict[str, Any], statuses: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent
+        # workers cannot interleave read-modify-write cycles
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            session = json.loads(row[0]) if row else None
+            if session is None or (statuses is not None and session.get("status") not in statuses):
+                self._conn.execute("COMMIT")
+                return None
+            session.update(self._small_fields(data))
+            bump_versions(session, data)
+            self._conn.execute(
+                "UPDATE sessions SET data = ?, version = ?, updated_at = ? WHERE session_id = ?",
+                (self._encode(session), session["version"], time.time(), session_id)
+            )
+            self._write_large_fields(session_id, data)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return json.loads(self._encode(session))
+
+    def _transaction(self, func: Callable, *args):
+        # BEGIN IMMEDIATE serializes the read-modify-write against other workers
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args)
+            self._conn.execute("COMMIT")
+            return result
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _join_flight(self, key: str, session_id: str) -> Optional[str]:
+        def join():
+            row = self._conn.execute("SELECT job_id FROM flights WHERE key = ?", (key,)).fetchone()
+            job_id = row[0] if row else None
+            if job_id is None:
+                self._conn.execute(
+                    "INSERT INTO flights (key, job_id, created_at) VALUES (?, ?, ?)", (key, session_id, time.time())
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO flight_members (session_id, job_id) VALUES (?, ?)",
+                (session_id, job_id or session_id)
+            )
+            return job_id
+        return self._transaction(join)
+
+    def _leave_flight(self, session_id: str) -> bool:
+        def leave():
+            row = self._conn.execute(
+                "SELECT job_id, (SELECT COUNT(*) FROM flight_members AS m WHERE m.job_id = f.job_id) "
+                "FROM flight_members AS f WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or row[1] <= 1:
+                return False
+            self._conn.execute("DELETE FROM flight_members WHERE session_id = ?", (session_id,))
+            return True
+        return self._transaction(leave)
+
+    def _finish_flight(self, job_id: str):
+        def finish():
+            self._conn.execute("DELETE FROM flights WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM flight_members WHERE job_id = ?", (job_id,))
+        self._transaction(finish)
+
+    def _delete(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self._get(session_id)
+        self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self._conn.execute("DELETE FROM session_fields WHERE session_id = ?", (session_id,))
+        return session
+
+    def _items(self, include_large: bool) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = self._conn.execute("SELECT session_id, data FROM sessions").fetchall()
+        sessions = {session_id: json.loads(data) for session_id, data in rows}
+        if include_large:
+            for session_id, field, value in self._conn.execute(
+                "SELECT session_id, field, value FROM session_fields"
+            ):
+                if session_id in sessions:
+                    sessions[session_id][field] = json.loads(value)
+        return list(sessions.items())
+
+    @staticmethod
+    def _encode(data: Any) -> str:
+        # ProcessingStatus is a str Enum and serializes to its value
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+def create_state_store(backend: str, db_path: str, poll_interval: float, event_retention: float):
+    """Create the configured state store ("memory" or "sqlite")"""
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        return SQLiteStateStore(db_path, poll_interval=poll_interval, event_retention=event_retention)
+    raise ValueError(f"Unknown state backend: {backend}")
@@ -0,0 +1,253 @@
+import os
+import time
+from typing import Dict, Any, Optional, Set, Tuple
+from api.state_store import MemoryStateStore
+from services.executor import run_blocking
+
+# Pins older than this were left behind by a worker that died mid-job
+PIN_TTL_SECONDS = 24 * 3600
+
+class StorageQuotaError(Exception):
+    """Raised when an upload cannot fit in the disk quota"""
+
+class StorageManager:
+    """Tracks uploaded audio on disk and enforces its lifecycle
+
+    - Audio is deleted after successful transcription, or kept for a
+      configurable retention period first.
+    - When the disk quota would be exceeded, the least recently used
+      files that are not currently being processed are evicted.
+    - Files no session refers to are reconciled away at startup and on every
+      sweep, which also picks up files written by other worker processes.
+    - Pins live in the shared state store, so a worker never evicts audio
+      that another worker is transcribing.
+    """
+
+    def __init__(
+        self,
+        upload_dir: str,
+        quota_bytes: int,
+        pins: MemoryStateStore,
+        retention_seconds: float = 0,
+        partial_ttl_seconds: float = 24 * 3600,
+        orphan_grace_seconds: float = 300
+    ):
+        self.upload_dir = upload_dir
+        self.partial_dir = os.path.join(upload_dir, ".partial")
+        self.quota_bytes = quota_bytes
+        self.pins = pins
+        self.retention_seconds = retention_seconds
+        self.partial_ttl_seconds = partial_ttl_seconds
+        # Files younger than this may belong to an upload whose session is not written yet
+        self.orphan_grace_seconds = orphan_grace_seconds
+
+        # path -> {"size", "last_access", "expires_at"}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # Shared pin count as of the last eviction or sweep
+        self.pinned_count = 0
+        self.counters = {
+            "evicted": 0,
+            "deleted_after_transcription": 0,
+            "expired": 0,
+            "orphans_removed": 0
+        }
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.files.values())
+
+    def register(self, file_path: str, size: Optional[int] = None):
+        """
+        Start tracking a file
+
+        Args:
+            file_path: Path of the file
+            size: Bytes to account for; defaults to the size on disk. Partial
+                uploads pass their declared size to reserve the space up front.
+        """
+        if size is None:
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                return
+        self.files[file_path] = {"size": size, "last_access": time.time(), "expires_at": None}
+
+    def forget(self, file_path: str):
+        """Stop tracking a file that was moved or removed elsewhere"""
+        self.files.pop(file_path, None)
+
+    def touch(self, file_path: str):
+        """Mark a file as recently used"""
+        if file_path in self.files:
+            self.files[file_path]["last_access"] = time.time()
+
+    async def pin(self, file_path: str):
+        """Protect a file from eviction by any worker while it is being processed"""
+        await self.pins.pin(file_path)
+        self.touch(file_path)
+
+    async def unpin(self, file_path: str):
+        await self.pins.unpin(file_path)
+
+    async def _pinned(self) -> Set[str]:
+        pinned = await self.pins.pinned(PIN_TTL_SECONDS)
+        self.pinned_count = len(pinned)
+        return pinned
+
+    def release_after_transcription(self, file_path: str) -> Optional[float]:
+        """
+        Delete audio once it has been transcribed, or schedule its expiry
+
+        Returns:
+            The expiry timestamp when the audio is retained, otherwise None.
+            Callers store it with the session so every worker honours it.
+        """
+        if self.retention_seconds <= 0:
+            if self._delete(file_path):
+                self.counters["deleted_after_transcription"] += 1
+            return None
+
+        expires_at = time.time() + self.retention_seconds
+        if file_path in self.files:
+            self.files[file_path]["expires_at"] = expires_at
+        return expires_at
+
+    async def ensure_capacity(self, incoming_bytes: int):
+        """
+        Make room for an incoming file by evicting least recently used audio
+
+        Args:
+            incoming_bytes: Size of the file about to be written
+
+        Raises:
+            StorageQuotaError: If the quota cannot be met even after eviction
+        """
+        if incoming_bytes > self.quota_bytes:
+            raise StorageQuotaError("檔案大小超過儲存空間配額")
+
+        used = self.used_bytes
+        if used + incoming_bytes <= self.quota_bytes:
+            return
+
+        pinned = await self._pinned()
+        candidates = sorted(
+            (path for path in self.files
+             if path not in pinned and not self._is_partial(path)),
+            key=lambda path: self.files[path]["last_access"]
+        )
+        for path in candidates:
+            if used + incoming_bytes <= self.quota_bytes:
+                break
+            entry = self.files.pop(path, None)
+            if entry is not None and await run_blocking(_remove, path):
+                used -= entry["size"]
+                self.counters["evicted"] += 1
+
+        if used + incoming_bytes > self.quota_bytes:
+            raise StorageQuotaError("儲存空間不足，請稍後再試")
+
+    async def sweep(self, live_files: Dict[str, Optional[float]]):
+        """
+        Sync the file index with the disk, then remove orphans, audio past its
+        retention period and stale partial uploads
+
+        The directory scan and deletions run in the blocking pool; only the
+        index update runs on the event loop.
+
+        Args:
+            live_files: File paths still referenced by a session, mapped to
+                their audio expiry timestamp (None if not scheduled)
+        """
+        live = {os.path.abspath(path): expires_at for path, expires_at in live_files.items() if path}
+        pinned = {os.path.abspath(path) for path in await self._pinned()}
+        known = {path: dict(entry) for path, entry in self.files.items()}
+
+        found, removed = await run_blocking(self._scan_disk, live, pinned, known)
+
+        for path, (size, mtime) in found.items():
+            entry = self.files.get(path) or known.get(path)
+            self.files[path] = {
+                "size": entry["size"] if entry and self._is_partial(path) else size,
+                "last_access": entry["last_access"] if entry else mtime,
+                "expires_at": live.get(os.path.abspath(path)) or (entry or {}).get("expires_at")
+            }
+        # Forget files removed here or by other processes; files registered
+        # while the scan was running are kept
+        for path in known:
+            if path not in found:
+                self.files.pop(path, None)
+        for counter, count in removed.items():
+            self.counters[counter] += count
+
+    def _scan_disk(
+        self, live: Dict[str, Optional[float]], pinned: Set[str], known: Dict[str, Dict[str, Any]]
+    ) -> Tuple[Dict[str, Tuple[int, float]], Dict[str, int]]:
+        """
+        Walk the upload directories and delete what is no longer needed (blocking)
+
+        Returns:
+            Tuple of (remaining files as path -> (size, mtime), removal counts by counter name)
+        """
+        now = time.time()
+        found: Dict[str, Tuple[int, float]] = {}
+        removed = {"expired": 0, "orphans_removed": 0}
+
+        for directory in (self.upload_dir, self.partial_dir):
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if not entry.is_file():
+                    continue
+                if directory == self.partial_dir and not entry.name.endswith(".part"):
+                    continue
+                path = os.path.join(directory, entry.name)
+                stat = entry.stat()
+                if directory == self.partial_dir:
+                    # Partial uploads stay resumable until they go stale
+                    if now - stat.st_mtime > self.partial_ttl_seconds:
+                        _remove(path)
+                        _remove(os.path.splitext(path)[0] + ".json")
+                        continue
+                elif os.path.abspath(path) not in pinned:
+                    if os.path.abspath(path) not in live:
+                        if now - stat.st_mtime > self.orphan_grace_seconds:
+                            if _remove(path):
+                                removed["orphans_removed"] += 1
+                            continue
+                    else:
+                        expires_at = live[os.path.abspath(path)] or known.get(path, {}).get("expires_at")
+                        if expires_at is not None and expires_at <= now:
+                            if _remove(path):
+                                removed["expired"] += 1
+                            continue
+
+                found[path] = (stat.st_size, stat.st_mtime)
+
+        return found, removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return current usage for the metrics endpoint"""
+        used = self.used_bytes
+        return {
+            "used_bytes": used,
+            "quota_bytes": self.quota_bytes,
+            "usage_ratio": round(used / self.quota_bytes, 4) if self.quota_bytes else None,
+            "file_count": len(self.files),
+            "pinned_count": self.pinned_count,
+            "retention_seconds": self.retention_seconds,
+            **self.counters
+        }
+
+    def _is_partial(self, path: str) -> bool:
+        return os.path.dirname(path) == self.partial_dir
+
+    def _delete(self, path: str) -> bool:
+        self.files.pop(path, None)
+        return _remove(path)
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,197 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, Tuple
+
+import aiofiles
+
+class UploadNotFoundError(Exception):
+    """Raised when a resumable upload does not exist"""
+
+class UploadOffsetError(Exception):
+    """Raised when a chunk does not start at the current upload offset"""
+
+    def __init__(self, expected: int, received: int):
+        super().__init__(f"上傳位移不符：目前為 {expected}，收到 {received}")
+        self.expected = expected
+        self.received = received
+
+class UploadManager:
+    """Manages resumable (chunked) audio uploads
+
+    Each upload is a ``<upload_id>.part`` file plus a ``<upload_id>.json``
+    sidecar under ``<upload_dir>/.partial``. The current offset is always the
+    size of the part file on disk, so an interrupted upload can be resumed
+    from whatever actually reached the disk. The SHA-256 of the content is
+    computed incrementally while chunks are appended.
+    """
+
+    HASH_READ_SIZE = 1024 * 1024
+
+    def __init__(self, upload_dir: str):
+        self.partial_dir = os.path.join(upload_dir, ".partial")
+        os.makedirs(self.partial_dir, exist_ok=True)
+        # upload_id -> (offset the hash covers, running hash)
+        self._hashers: Dict[str, Tuple[int, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def create_upload(self, file_name: str, file_size: int, paper_title: str = "") -> Dict[str, Any]:
+        """Register a new upload and create its empty part file"""
+        upload_id = str(uuid.uuid4())
+        metadata = {
+            "upload_id": upload_id,
+            "file_name": file_name,
+            "file_ext": os.path.splitext(file_name)[1].lower(),
+            "file_size": file_size,
+            "paper_title": paper_title,
+            "created_at": datetime.now().isoformat()
+        }
+
+        with open(self._meta_path(upload_id), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        open(self.part_path(upload_id), "wb").close()
+
+        self._hashers[upload_id] = (0, hashlib.sha256())
+        return {**metadata, "offset": 0}
+
+    def get_upload(self, upload_id: str) -> Dict[str, Any]:
+        """Get upload metadata together with the current offset"""
+        meta_path = self._meta_path(upload_id)
+        part_path = self.part_path(upload_id)
+        if not os.path.exists(meta_path) or not os.path.exists(part_path):
+            raise UploadNotFoundError(f"找不到指定的上傳：{upload_id}")
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        metadata["offset"] = os.path.getsize(part_path)
+        return metadata
+
+    async def append_chunk(
+        self,
+        upload_id: str,
+        offset: int,
+        chunks: AsyncIterator[bytes]
+    ) -> int:
+        """
+        Append a byte range to an upload
+
+        Args:
+            upload_id: Upload identifier
+            offset: Offset the client believes the range starts at
+            chunks: Async iterator over the request body
+
+        Returns:
+            The new offset after the bytes that reached the disk
+
+        Raises:
+            UploadNotFoundError: If the upload does not exist
+            UploadOffsetError: If offset is not the current upload offset
+            ValueError: If the range would exceed the declared file size
+        """
+        async with self._lock(upload_id):
+            metadata = self.get_upload(upload_id)
+            current = metadata["offset"]
+            if offset != current:
+                raise UploadOffsetError(current, offset)
+
+            hasher = await self._get_hasher(upload_id, current)
+            try:
+                async with aiofiles.open(self.part_path(upload_id), "ab") as f:
+                    async for chunk in chunks:
+                        if not chunk:
+                            continue
+                        if current + len(chunk) > metadata["file_size"]:
+                            raise ValueError("上傳內容超過宣告的檔案大小")
+                        await f.write(chunk)
+                        hasher.update(chunk)
+                        current += len(chunk)
+            finally:
+                # Whatever was written stays on disk and remains resumable
+                self._hashers[upload_id] = (current, hasher)
+
+            return current
+
+    async def finalize(self, upload_id: str, destination: str) -> Dict[str, Any]:
+        """
+        Move a fully received upload to its final location
+
+        Args:
+            upload_id: Upload identifier
+            destination: Final file path
+
+        Returns:
+            Upload metadata including ``content_sha256``
+        """
+        async with self._lock(upload_id):
+            metadata = self.get_upload(upload_id)
+            if metadata["offset"] != metadata["file_size"]:
+                raise UploadOffsetError(metadata["file_size"], metadata["offset"])
+
+            hasher = await self._get_hasher(upload_id, metadata["offset"])
+            metadata["content_sha256"] = hasher.hexdigest()
+
+            os.replace(self.part_path(upload_id), destination)
+            self._remove(upload_id)
+
+        self._locks.pop(upload_id, None)
+        return metadata
+
+    def abort(self, upload_id: str):
+        """Discard an upload and its partial data"""
+        self.get_upload(upload_id)
+        self._remove(upload_id)
+        try:
+            os.remove(self.part_path(upload_id))
+        except OSError:
+            pass
+        self._locks.pop(upload_id, None)
+
+    async def _get_hasher(self, upload_id: str, offset: int):
+        """Return a running hash covering exactly ``offset`` bytes"""
+        cached = self._hashers.get(upload_id)
+        if cached and cached[0] == offset:
+            return cached[1]
+
+        # State lost (restart or another process wrote the chunk): catch up from disk
+        hasher = hashlib.sha256()
+        remaining = offset
+        async with aiofiles.open(self.part_path(upload_id), "rb") as f:
+            while remaining > 0:
+                block = await f.read(min(self.HASH_READ_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+
+        self._hashers[upload_id] = (offset, hasher)
+        return hasher
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        if upload_id not in self._locks:
+            self._locks[upload_id] = asyncio.Lock()
+        return self._locks[upload_id]
+
+    def _remove(self, upload_id: str):
+        self._hashers.pop(upload_id, None)
+        try:
+            os.remove(self._meta_path(upload_id))
+        except OSError:
+            pass
+
+    def part_path(self, upload_id: str) -> str:
+        """Path of the partial data file for an upload"""
+        return os.path.join(self.partial_dir, f"{self._validate_id(upload_id)}.part")
+
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.partial_dir, f"{self._validate_id(upload_id)}.json")
+
+    @staticmethod
+    def _validate_id(upload_id: str) -> str:
+        # Upload IDs end up in file paths; only accept canonical UUIDs
+        try:
+            return str(uuid.UUID(upload_id))
+        except ValueError:
+            raise UploadNotFoundError(f"找不到指定的上傳：{upload_id}")
@@ -0,0 +1,152 @@
+"""
+Multi-worker throughput benchmark
+
+Starts the API under ``uvicorn --workers N`` with the shared SQLite state
+backend and drives it with several client processes. Every client opens a
+new connection per request, so an upload, the follow-up result polls and
+the transcript page routinely land on different workers. Any "session not
+found" (404) is therefore a cross-worker consistency failure.
+
+Usage (from src/main/python):
+    python benchmarks/multiworker_benchmark.py --workers 1 2 4 --clients 8 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers: int, port: int, work_dir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "",
+        "STATE_BACKEND": "sqlite",
+        "STATE_DB_PATH": os.path.join(work_dir, "state.db"),
+        "UPLOAD_DIR": os.path.join(work_dir, "uploads"),
+        "LOOP_MONITOR_ENABLED": "false"
+    })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=APP_DIR, env=env
+    )
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                # Give the remaining workers a moment to finish booting
+                time.sleep(1 + workers * 0.5)
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not become ready")
+
+async def client_loop(base_url: str, duration: float) -> Dict[str, List]:
+    latencies: List[float] = []
+    errors = 0
+    misses = 0
+    audio = os.urandom(16 * 1024)
+
+    # No keep-alive: each request may be accepted by a different worker
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        end = time.time() + duration
+        while time.time() < end:
+            try:
+                start = time.perf_counter()
+                response = await client.post("/api/upload", files={"file": ("bench.mp3", audio)})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                session_id = response.json()["session_id"]
+
+                for path, params in (
+                    (f"/api/result/{session_id}", {"fields": "status,version"}),
+                    (f"/api/result/{session_id}/transcript", {"limit": 100}),
+                ):
+                    start = time.perf_counter()
+                    response = await client.get(path, params=params)
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code == 404:
+                        misses += 1
+                    elif response.status_code != 200:
+                        errors += 1
+            except httpx.HTTPError:
+                errors += 1
+
+    return {"latencies": latencies, "errors": errors, "misses": misses}
+
+def client_process(base_url: str, duration: float, queue):
+    queue.put(asyncio.run(client_loop(base_url, duration)))
+
+def run_load(base_url: str, clients: int, duration: float) -> Dict[str, float]:
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=client_process, args=(base_url, duration, queue))
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        "errors": sum(result["errors"] for result in results),
+        "misses": sum(result["misses"] for result in results)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput scaling with worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="Client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    args = parser.parse_args()
+
+    rows = []
+    for workers in args.workers:
+        work_dir = tempfile.mkdtemp(prefix="bench-state-")
+        port = free_port()
+        server = start_server(workers, port, work_dir)
+        try:
+            stats = run_load(f"http://127.0.0.1:{port}", args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(work_dir, ignore_errors=True)
+        rows.append((workers, stats))
+
+    baseline = rows[0][1]["rps"] or 1
+    print(f"{'workers':>7} {'req/s':>9} {'scaling':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'404s':>6}")
+    for workers, stats in rows:
+        print(
+            f"{workers:>7} {stats['rps']:>9.1f} {stats['rps'] / baseline:>7.2f}x "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['errors']:>7} {stats['misses']:>6}"
+        )
+
+if __name__ == "__main__":
+    main()
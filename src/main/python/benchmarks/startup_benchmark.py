@@ -0,0 +1,107 @@
+"""
+Startup benchmark for the FastAPI backend
+
+Measures, in fresh interpreter processes, how long ``import main`` takes and
+how long it takes until the app answers its first ``/api/health`` request.
+This is the cost every uvicorn worker (and every ``--reload`` restart) pays
+before it can serve traffic. Runs without OPENAI_API_KEY by default to make
+sure the app still boots.
+
+Usage (from src/main/python):
+    python benchmarks/startup_benchmark.py --runs 10 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+print(f"IMPORT {time.perf_counter() - start:.6f}")
+"""
+
+READY_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+response = client.get("/api/health")
+assert response.status_code == 200, response.text
+print(f"READY {time.perf_counter() - start:.6f}")
+"""
+
+def run_snippet(snippet: str, marker: str, env: Dict[str, str]) -> float:
+    """Run a snippet in a fresh interpreter and return the reported duration"""
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith(marker):
+            return float(line.split()[1])
+    raise RuntimeError(f"No {marker} line in output:\n{result.stdout}\n{result.stderr}")
+
+def import_profile(env: Dict[str, str], top: int) -> List[Tuple[int, str]]:
+    """Return the modules with the highest cumulative import time (microseconds)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: <self us> | <cumulative us> | <module>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative_us), name.strip()))
+    entries.sort(reverse=True)
+    return entries[:top]
+
+def summarize(label: str, samples: List[float]):
+    samples_ms = sorted(s * 1000 for s in samples)
+    print(
+        f"{label:<22} min {samples_ms[0]:8.1f} ms | "
+        f"median {statistics.median(samples_ms):8.1f} ms | "
+        f"max {samples_ms[-1]:8.1f} ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure backend startup and import cost")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--with-api-key", action="store_true",
+                        help="Keep OPENAI_API_KEY from the environment instead of clearing it")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.with_api_key:
+        env["OPENAI_API_KEY"] = ""
+
+    import_samples = [run_snippet(IMPORT_SNIPPET, "IMPORT", env) for _ in range(args.runs)]
+    ready_samples = [run_snippet(READY_SNIPPET, "READY", env) for _ in range(args.runs)]
+
+    print(f"Startup benchmark ({args.runs} runs, python {sys.version.split()[0]})")
+    summarize("import main", import_samples)
+    summarize("first /api/health", ready_samples)
+
+    print(f"\nTop {args.top} imports by cumulative time:")
+    for cumulative_us, name in import_profile(env, args.top):
+        print(f"{cumulative_us / 1000:10.1f} ms  {name}")
+
+    # Modules that should only be loaded when a request actually needs them
+    check = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print(','.join(m for m in ('openai', 'uvicorn') if m in sys.modules))"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    eager = check.stdout.strip()
+    print(f"\nDeferred modules loaded at import: {eager or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+WebSocket scalability benchmark
+
+Starts the API (single worker, in-memory state) and opens thousands of
+concurrent progress sockets against it, spread over a number of sessions.
+Reports:
+
+- server memory per connection (RSS growth from /proc divided by sockets)
+- broadcast latency: every session is cancelled at once and the time until
+  each subscriber receives the "cancelled" update is measured
+
+Usage (from src/main/python, Linux):
+    python benchmarks/websocket_benchmark.py --connections 5000 --fanout 100
+    python benchmarks/websocket_benchmark.py --connections 5000 --server-deflate
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+import websockets
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from models.schemas import ProcessingStatus
+
+CANCELLED = ProcessingStatus.CANCELLED.value
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def start_server(port: int, work_dir: str, connections: int, deflate: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "",
+        "UPLOAD_DIR": os.path.join(work_dir, "uploads"),
+        "LOOP_MONITOR_ENABLED": "false",
+        # Every benchmark socket comes from 127.0.0.1
+        "WS_MAX_CONNECTIONS": str(connections + 100),
+        "WS_MAX_CONNECTIONS_PER_IP": str(connections + 100)
+    })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--backlog", "4096",
+         "--ws-per-message-deflate", str(deflate).lower()],
+        cwd=APP_DIR, env=env
+    )
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not become ready")
+
+async def create_sessions(client: httpx.AsyncClient, count: int) -> List[str]:
+    audio = os.urandom(1024)
+    sessions = []
+    for _ in range(count):
+        response = await client.post("/api/upload", files={"file": ("bench.mp3", audio)})
+        response.raise_for_status()
+        sessions.append(response.json()["session_id"])
+    return sessions
+
+async def open_sockets(ws_url: str, sessions: List[str], count: int, batch: int) -> Tuple[List, int]:
+    sockets, failures = [], 0
+    for begin in range(0, count, batch):
+        attempts = [
+            websockets.connect(
+                f"{ws_url}/ws/{sessions[index % len(sessions)]}",
+                open_timeout=30, ping_interval=None, max_queue=4
+            )
+            for index in range(begin, min(begin + batch, count))
+        ]
+        for result in await asyncio.gather(*attempts, return_exceptions=True):
+            if isinstance(result, Exception):
+                failures += 1
+            else:
+                sockets.append(result)
+    # Drain the "connected" greeting
+    await asyncio.gather(*(ws.recv() for ws in sockets), return_exceptions=True)
+    return sockets, failures
+
+async def wait_for_cancel(ws, sent_at: Dict[str, float]) -> float:
+    while True:
+        update = json.loads(await ws.recv())
+        if update.get("status") == CANCELLED:
+            return time.perf_counter() - sent_at[update["session_id"]]
+
+async def run(args, port: int, server_pid: int) -> Dict[str, float]:
+    base_url = f"http://127.0.0.1:{port}"
+    sessions_needed = max(1, -(-args.connections // args.fanout))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        sessions = await create_sessions(client, sessions_needed)
+        await asyncio.sleep(1)
+        baseline_kb = rss_kb(server_pid)
+
+        start = time.perf_counter()
+        sockets, failures = await open_sockets(
+            base_url.replace("http", "ws"), sessions, args.connections, args.batch
+        )
+        open_s = time.perf_counter() - start
+        await asyncio.sleep(2)
+        loaded_kb = rss_kb(server_pid)
+
+        # Broadcast: cancel every session at once
+        sent_at: Dict[str, float] = {}
+        receivers = [asyncio.create_task(wait_for_cancel(ws, sent_at)) for ws in sockets]
+
+        async def cancel(session_id: str):
+            sent_at[session_id] = time.perf_counter()
+            await client.post(f"/api/cancel/{session_id}")
+
+        await asyncio.gather(*(cancel(session_id) for session_id in sessions))
+        done, pending = await asyncio.wait(receivers, timeout=args.broadcast_timeout)
+        for task in pending:
+            task.cancel()
+        latencies = sorted(task.result() for task in done if task.exception() is None)
+
+        metrics = (await client.get("/api/metrics")).json().get("websockets", {})
+
+    await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+
+    return {
+        "opened": len(sockets),
+        "failed": failures,
+        "open_s": open_s,
+        "baseline_mb": baseline_kb / 1024,
+        "loaded_mb": loaded_kb / 1024,
+        "kb_per_connection": (loaded_kb - baseline_kb) / max(1, len(sockets)),
+        "delivered": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        "max_ms": latencies[-1] * 1000 if latencies else 0,
+        "server": metrics
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure WebSocket memory and broadcast latency")
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--fanout", type=int, default=100, help="Subscribers per session")
+    parser.add_argument("--batch", type=int, default=200, help="Sockets opened concurrently")
+    parser.add_argument("--broadcast-timeout", type=float, default=30.0)
+    parser.add_argument("--server-deflate", action="store_true",
+                        help="Enable per-message deflate on the server")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench-ws-")
+    port = free_port()
+    server = start_server(port, work_dir, args.connections, args.server_deflate)
+    try:
+        stats = asyncio.run(run(args, port, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"sockets opened      {stats['opened']} ({stats['failed']} failed) in {stats['open_s']:.1f}s")
+    print(f"server RSS          {stats['baseline_mb']:.1f} MB -> {stats['loaded_mb']:.1f} MB")
+    print(f"memory/connection   {stats['kb_per_connection']:.1f} KB")
+    print(f"broadcast delivered {stats['delivered']}/{stats['opened']}")
+    print(
+        f"broadcast latency   p50 {stats['p50_ms']:.1f} ms  p95 {stats['p95_ms']:.1f} ms  "
+        f"p99 {stats['p99_ms']:.1f} ms  max {stats['max_ms']:.1f} ms"
+    )
+    print(f"server metrics      {stats['server']}")
+
+if __name__ == "__main__":
+    main()
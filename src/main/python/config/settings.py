@@ -13,26 +13,86 @@ class Settings(BaseSettings):
     
     # Whisper API Settings
     whisper_model: str = "whisper-1"
-    max_file_size_mb: int = 30
+    whisper_timestamps: bool = True  # Request verbose_json and keep segment timings
+    max_file_size_mb: int = 25  # Whisper API rejects files over 25 MB
     
     # ChatGPT API Settings
-    chatgpt_model: str = "gpt-4o-mini"
+    chatgpt_model: str = "gpt-4o-mini"  # Economy model, also the default for tags/refinement
+    chatgpt_quality_model: str = "gpt-4o"
     max_tokens: int = 2000
     temperature: float = 0.3
     
+    # Model Routing (summary requests)
+    route_default_cost_tier: str = "economy"  # economy | balanced | quality; only economy keeps summaries on chatgpt_model
+    route_quality_max_input_tokens: int = 4000  # "balanced" uses the quality model up to this size
+    route_output_ratio: float = 0.2  # max_tokens as a fraction of estimated input tokens
+    route_min_output_tokens: int = 600
+    route_timeout_s: float = 45.0  # Per-attempt timeout before falling back to another model
+    
+    # Stage Deadlines and Request Hedging
+    transcription_deadline_s: float = 900.0  # Whole transcription stage, including retries
+    summary_deadline_s: float = 240.0  # Whole summary stage, including model fallbacks
+    tags_deadline_s: float = 30.0  # Tag generation; the note is saved without generated tags after this
+    hedging_enabled: bool = False  # Duplicate requests that run past the observed p95
+    hedge_budget_ratio: float = 0.05  # At most this fraction of requests may be hedged
+    
     # Obsidian Settings
     default_obsidian_vault: str = os.getenv("DEFAULT_OBSIDIAN_VAULT", "Obsidian Vault")
     default_paper_path: str = os.getenv("DEFAULT_PAPER_PATH", "Papers/Summaries")
     
+    # Progress and ETA Settings
+    eta_model_path: str = "state/eta_model.json"  # Observed stage durations by audio length
+    progress_tick_interval_s: float = 2.0  # How often running jobs publish interpolated progress
+    
+    # Note Export Settings
+    export_cursor_path: str = "state/export_cursors.json"  # "since last export" cursors
+    
+    # Job Scheduling Settings
+    max_concurrent_jobs: int = 2  # Jobs processed at once per worker; the rest queue by priority
+    
+    # Shared State Settings ("memory" = single worker, "sqlite" = all local workers)
+    state_backend: str = os.getenv("STATE_BACKEND", "memory")
+    state_db_path: str = "state/state.db"
+    state_poll_interval_ms: int = 100  # How often workers pick up each other's events
+    state_event_retention_s: int = 600
+    
+    # WebSocket Settings (progress subscribers)
+    ws_max_connections: int = 10000  # Per worker
+    ws_max_connections_per_ip: int = 50
+    ws_idle_timeout_s: float = 900.0  # Close sockets with no traffic either way; 0 disables
+    ws_send_timeout_s: float = 5.0  # Drop subscribers that cannot take a message in time
+    ws_ping_interval_s: float = 20.0  # Protocol pings detect peers that vanished without a close frame
+    ws_ping_timeout_s: float = 20.0
+    ws_max_message_bytes: int = 65536  # Clients only send keepalives
+    ws_per_message_deflate: bool = False  # Progress messages are tiny; compression state costs memory per socket
+    
     # Server Settings
+    gzip_minimum_size: int = 1024  # Responses larger than this are gzip-compressed
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
     debug: bool = os.getenv("DEBUG", "true").lower() == "true"
+    workers: int = int(os.getenv("WORKERS", "1"))  # >1 requires state_backend="sqlite"; identical jobs then coalesce across workers through the store
     
     # File Upload Settings
     upload_dir: str = "uploads"
     allowed_extensions: list = [".mp3", ".m4a", ".wav", ".mp4", ".flac", ".ogg"]
     
+    # Resumable Upload Settings (chunks are appended straight to disk)
+    max_resumable_file_size_mb: int = 25  # Whisper API rejects files over 25 MB; nothing splits audio
+    upload_chunk_size_mb: int = 5
+    
+    # Upload Storage Lifecycle
+    upload_quota_mb: int = 2048  # Disk quota for upload_dir; LRU eviction beyond it
+    audio_retention_hours: float = 0  # 0 = delete audio right after transcription
+    partial_upload_ttl_hours: float = 24  # Unfinished resumable uploads expire after this
+    storage_sweep_interval_s: int = 300
+    
+    # Event Loop Settings
+    blocking_pool_workers: int = 8  # Threads for blocking file I/O and encoding
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: int = 50
+    loop_lag_threshold_ms: int = 100  # Stalls longer than this are recorded
+    
     class Config:
         env_file = ".env"
 
@@ -1,24 +1,70 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect, Request, Response, Header, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-import uvicorn
+from fastapi.middleware.gzip import GZipMiddleware
 import asyncio
 import uuid
+from datetime import date, datetime
 import os
-from typing import Dict, Set
+import hashlib
+import zlib
+import anyio
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set
 import json
+from contextlib import asynccontextmanager
 
 from config.settings import settings
 from models.schemas import *
-from services.whisper_service import WhisperService
-from services.chatgpt_service import ChatGPTService
-from services.obsidian_service import ObsidianService
 from api.progress_manager import ProgressManager
+from api.state_store import create_state_store
+from api.job_scheduler import JobScheduler
+from api.flight_registry import FlightRegistry
+from api.upload_manager import UploadManager, UploadNotFoundError, UploadOffsetError
+from api.loop_monitor import LoopLagMonitor
+from api.storage_manager import StorageManager, StorageQuotaError
+from services.executor import blocking_executor, run_blocking
+from services.hedging import request_hedger
+from services.eta_model import ThroughputModel, ProgressPlan
+from services.note_export import ExportCursors, cursor_key, stream_tar_gz, stream_zip, unique_path
+from services.obsidian_service import DEFAULT_NOTE_TAGS
+from services.transcript_segments import TranscriptSegments
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background infrastructure"""
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    await progress_manager.start()
+    await job_scheduler.start()
+    await run_blocking(throughput_model.load)
+    # Importing the OpenAI SDK takes a few hundred ms; do it in the pool so the
+    # first request needing a service does not stall the loop
+    warmup = asyncio.create_task(run_blocking(import_services))
+    
+    # Drop audio no session refers to (e.g. left behind by a previous run)
+    await sweep_storage()
+    sweeper = asyncio.create_task(storage_sweep_loop())
+    
+    yield
+    
+    sweeper.cancel()
+    await asyncio.gather(warmup, return_exceptions=True)
+    # Jobs that never started would stay QUEUED in a shared store and could not be resubmitted
+    for job_id in job_scheduler.queued_jobs():
+        await update_job_progress(job_id, ProcessingStatus.CANCELLED, 0, "伺服器關閉，處理已取消")
+        await storage_manager.unpin(await progress_manager.get_session_field(job_id, "file_path"))
+        await flights.finish(job_id)
+    await job_scheduler.stop()
+    await progress_manager.stop()
+    await loop_monitor.stop()
+    blocking_executor.shutdown()
 
 app = FastAPI(
     title="Obsidian Paper Note API",
     description="Academic Podcast to Obsidian Notetaker",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - Allow multiple frontend ports
@@ -33,16 +79,85 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Upload-Offset"],
 )
 
-# Initialize services
-whisper_service = WhisperService()
-chatgpt_service = ChatGPTService()
-obsidian_service = ObsidianService()
-progress_manager = ProgressManager()
+# Compress large bodies (full transcripts, summaries, Obsidian URIs)
+app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
+def import_services():
+    """Import the service modules (and the OpenAI SDK) without building services"""
+    import services.whisper_service
+    import services.chatgpt_service
+
+# Services are built lazily on first use: importing this module must stay cheap
+# and must not require OPENAI_API_KEY (health checks, tests, benchmarks, --reload).
+@lru_cache(maxsize=None)
+def get_whisper_service():
+    from services.whisper_service import WhisperService
+    return WhisperService()
+
+@lru_cache(maxsize=None)
+def get_chatgpt_service():
+    from services.chatgpt_service import ChatGPTService
+    return ChatGPTService()
+
+@lru_cache(maxsize=None)
+def get_obsidian_service():
+    from services.obsidian_service import ObsidianService
+    return ObsidianService()
+
+# With state_backend="sqlite", sessions, progress events and in-flight jobs are
+# shared by all local worker processes (e.g. uvicorn --workers N)
+progress_manager = ProgressManager(
+    create_state_store(
+        settings.state_backend,
+        settings.state_db_path,
+        poll_interval=settings.state_poll_interval_ms / 1000,
+        event_retention=settings.state_event_retention_s
+    ),
+    max_connections=settings.ws_max_connections,
+    max_connections_per_ip=settings.ws_max_connections_per_ip,
+    idle_timeout_s=settings.ws_idle_timeout_s,
+    send_timeout_s=settings.ws_send_timeout_s
+)
+job_scheduler = JobScheduler(settings.max_concurrent_jobs)
+throughput_model = ThroughputModel(settings.eta_model_path)
+flights = FlightRegistry(progress_manager.store)
+export_cursors = ExportCursors(settings.export_cursor_path)
+loop_monitor = LoopLagMonitor(
+    interval=settings.loop_monitor_interval_ms / 1000,
+    threshold=settings.loop_lag_threshold_ms / 1000
+)
 
 # Ensure upload directory exists
 os.makedirs(settings.upload_dir, exist_ok=True)
+upload_manager = UploadManager(settings.upload_dir)
+storage_manager = StorageManager(
+    settings.upload_dir,
+    quota_bytes=settings.upload_quota_mb * 1024 * 1024,
+    pins=progress_manager.store,
+    retention_seconds=settings.audio_retention_hours * 3600,
+    partial_ttl_seconds=settings.partial_upload_ttl_hours * 3600
+)
+
+async def sweep_storage():
+    """Sync the storage index with the disk and the sessions that still reference audio"""
+    live_files = {
+        data["file_path"]: data.get("audio_expires_at")
+        for _, data in await progress_manager.iter_sessions(include_large=False)
+        if data.get("file_path")
+    }
+    await storage_manager.sweep(live_files)
+
+async def storage_sweep_loop():
+    """Periodically delete expired audio and stale partial uploads"""
+    while True:
+        await asyncio.sleep(settings.storage_sweep_interval_s)
+        try:
+            await sweep_storage()
+        except Exception as e:
+            print(f"Storage sweep failed: {e}")
 
 @app.get("/")
 async def root():
@@ -68,12 +183,12 @@ async def health_check():
         chatgpt_status = "✅ Ready"
         
         try:
-            whisper_service.client
+            get_whisper_service().client
         except Exception as e:
             whisper_status = f"❌ Error: {str(e)}"
             
         try:
-            chatgpt_service.client
+            get_chatgpt_service().client
         except Exception as e:
             chatgpt_status = f"❌ Error: {str(e)}"
         
@@ -93,20 +208,29 @@ async def health_check():
             "message": f"Health check failed: {str(e)}"
         }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Runtime metrics: event loop, blocking pool, storage, jobs, token usage, hedging, WebSockets and ETA model"""
+    return {
+        "event_loop": loop_monitor.snapshot(),
+        "blocking_executor": blocking_executor.stats(),
+        "storage": storage_manager.stats(),
+        "jobs": job_scheduler.stats(),
+        "flights": await flights.stats(),
+        # Per-operation token usage; cached_tokens shows provider prompt-cache reuse
+        "chatgpt": get_chatgpt_service().usage_snapshot(),
+        "model_routing": get_chatgpt_service().router.snapshot(),
+        "hedging": request_hedger.stats(),
+        "websockets": progress_manager.connection_stats(),
+        "eta_model": throughput_model.snapshot()
+    }
+
 @app.post("/api/upload", response_model=Dict[str, str])
 async def upload_audio(file: UploadFile = File(...), paper_title: str = ""):
     """Upload audio file and return session ID"""
     
     # Validate file
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="沒有選擇檔案")
-    
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in settings.allowed_extensions:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"不支援的檔案格式。支援格式：{', '.join(settings.allowed_extensions)}"
-        )
+    file_ext = validate_audio_filename(file.filename)
     
     # Check file size
     content = await file.read()
@@ -120,118 +244,606 @@ async def upload_audio(file: UploadFile = File(...), paper_title: str = ""):
     session_id = str(uuid.uuid4())
     file_path = os.path.join(settings.upload_dir, f"{session_id}{file_ext}")
     
+    await reserve_storage(len(content))
+    # Account for the file before the write yields, so concurrent uploads cannot overcommit
+    storage_manager.register(file_path, size=len(content))
+    try:
+        content_sha256 = await run_blocking(save_upload_file, file_path, content)
+    except Exception:
+        storage_manager.forget(file_path)
+        raise
+    
+    # Store session info
+    await create_upload_session(session_id, file_path, file.filename, paper_title, content_sha256)
+    
+    return {"session_id": session_id, "message": "檔案上傳成功"}
+
+def save_upload_file(file_path: str, content: bytes) -> str:
+    """Write uploaded content to disk and return its SHA-256 (runs in the blocking pool)"""
     with open(file_path, "wb") as f:
         f.write(content)
+    return hashlib.sha256(content).hexdigest()
+
+async def reserve_storage(size: int):
+    """Make room for an upload within the disk quota"""
+    try:
+        await storage_manager.ensure_capacity(size)
+    except StorageQuotaError as e:
+        raise HTTPException(status_code=507, detail=str(e))
+
+def validate_audio_filename(file_name: str) -> str:
+    """Validate an uploaded file name and return its lowercase extension"""
+    if not file_name:
+        raise HTTPException(status_code=400, detail="沒有選擇檔案")
     
-    # Store session info
-    progress_manager.create_session(session_id, {
+    file_ext = os.path.splitext(file_name)[1].lower()
+    if file_ext not in settings.allowed_extensions:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"不支援的檔案格式。支援格式：{', '.join(settings.allowed_extensions)}"
+        )
+    return file_ext
+
+async def create_upload_session(
+    session_id: str, file_path: str, file_name: str, paper_title: str, content_sha256: str
+):
+    """Register a session for a fully uploaded audio file"""
+    # Reading audio metadata touches the file; keep it off the loop
+    audio_duration_s = await run_blocking(get_whisper_service().estimate_audio_duration, file_path)
+    await progress_manager.create_session(session_id, {
         "file_path": file_path,
-        "file_name": file.filename,
-        "paper_title": paper_title or file.filename,
+        "file_name": file_name,
+        "paper_title": paper_title or file_name,
+        "content_sha256": content_sha256,
+        "audio_duration_s": round(audio_duration_s, 1),
+        "created_at": datetime.now().isoformat(),
         "status": ProcessingStatus.PENDING
     })
+
+def build_upload_status(upload: Dict) -> ResumableUploadStatus:
+    return ResumableUploadStatus(
+        upload_id=upload["upload_id"],
+        file_name=upload["file_name"],
+        file_size=upload["file_size"],
+        offset=upload["offset"],
+        chunk_size=settings.upload_chunk_size_mb * 1024 * 1024,
+        completed=upload["offset"] == upload["file_size"]
+    )
+
+# Resumable uploads: create -> PATCH byte ranges -> query offset -> complete
+@app.post("/api/uploads", response_model=ResumableUploadStatus)
+async def create_resumable_upload(request: ResumableUploadCreateRequest):
+    """Start a resumable upload for a large audio file"""
+    validate_audio_filename(request.file_name)
+    
+    if request.file_size > settings.max_resumable_file_size_mb * 1024 * 1024:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"檔案過大。最大支援 {settings.max_resumable_file_size_mb}MB"
+        )
+    
+    await reserve_storage(request.file_size)
+    upload = upload_manager.create_upload(
+        request.file_name, request.file_size, request.paper_title
+    )
+    # Account for the declared size now so concurrent uploads cannot overcommit
+    storage_manager.register(upload_manager.part_path(upload["upload_id"]), size=request.file_size)
+    return build_upload_status(upload)
+
+@app.get("/api/uploads/{upload_id}", response_model=ResumableUploadStatus)
+async def get_resumable_upload(upload_id: str, response: Response):
+    """Query the current offset of a resumable upload"""
+    try:
+        upload = upload_manager.get_upload(upload_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    response.headers["Upload-Offset"] = str(upload["offset"])
+    return build_upload_status(upload)
+
+@app.patch("/api/uploads/{upload_id}", response_model=ResumableUploadStatus)
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset")
+):
+    """Append the request body to the upload at the given byte offset"""
+    try:
+        offset = await upload_manager.append_chunk(upload_id, upload_offset, request.stream())
+        storage_manager.touch(upload_manager.part_path(upload_id))
+        upload = upload_manager.get_upload(upload_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadOffsetError as e:
+        raise HTTPException(
+            status_code=409, detail=str(e), headers={"Upload-Offset": str(e.expected)}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    response.headers["Upload-Offset"] = str(offset)
+    return build_upload_status(upload)
+
+@app.post("/api/uploads/{upload_id}/complete", response_model=Dict[str, str])
+async def complete_resumable_upload(upload_id: str):
+    """Finalize a fully received upload and return session ID"""
+    try:
+        upload = upload_manager.get_upload(upload_id)
+        session_id = str(uuid.uuid4())
+        file_path = os.path.join(settings.upload_dir, f"{session_id}{upload['file_ext']}")
+        part_path = upload_manager.part_path(upload_id)
+        upload = await upload_manager.finalize(upload_id, file_path)
+        storage_manager.forget(part_path)
+        storage_manager.register(file_path)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadOffsetError as e:
+        raise HTTPException(
+            status_code=409, 
+            detail=f"上傳尚未完成：已接收 {e.received} / {e.expected} bytes",
+            headers={"Upload-Offset": str(e.received)}
+        )
+    
+    await create_upload_session(
+        session_id, file_path, upload["file_name"], upload["paper_title"],
+        upload["content_sha256"]
+    )
     
     return {"session_id": session_id, "message": "檔案上傳成功"}
 
+@app.delete("/api/uploads/{upload_id}", response_model=Dict[str, str])
+async def abort_resumable_upload(upload_id: str):
+    """Discard an unfinished resumable upload"""
+    try:
+        upload_manager.abort(upload_id)
+        storage_manager.forget(upload_manager.part_path(upload_id))
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return {"upload_id": upload_id, "message": "上傳已取消"}
+
+# Statuses from which a session may be (re)processed; any other status means a job owns it
+PROCESSABLE_STATUSES = (
+    ProcessingStatus.PENDING, ProcessingStatus.COMPLETED, ProcessingStatus.ERROR, ProcessingStatus.CANCELLED
+)
+
 @app.post("/api/process", response_model=Dict[str, str])
-async def process_audio(session_id: str):
-    """Start processing audio (transcription + summarization)"""
+async def process_audio(
+    session_id: str,
+    priority: JobPriority = JobPriority.INTERACTIVE,
+    cost_tier: Optional[CostTier] = None,
+    latency_target_s: Optional[float] = Query(None, gt=0)
+):
+    """Queue audio processing (transcription + summarization)
+    
+    Interactive jobs start ahead of queued batch jobs (e.g. bulk imports).
+    cost_tier and latency_target_s steer which model writes the summary.
+    """
     
-    session_data = progress_manager.get_session(session_id)
+    session_data = await progress_manager.get_session(session_id)
     if not session_data:
         raise HTTPException(status_code=404, detail="找不到指定的會話")
     
-    # Start background processing
-    asyncio.create_task(process_audio_background(session_id))
+    # Audio may have been released after an earlier transcription or evicted by quota
+    if not session_data.get("transcript") and not os.path.exists(session_data["file_path"]):
+        raise HTTPException(status_code=410, detail="音檔已被清除，請重新上傳")
+    
+    # Claim the session atomically in the shared store: of concurrent requests,
+    # possibly on different workers, only one moves it to QUEUED and runs it
+    claimed = await progress_manager.claim_session(session_id, PROCESSABLE_STATUSES, {
+        "status": ProcessingStatus.QUEUED,
+        "priority": priority.value,
+        "cost_tier": cost_tier.value if cost_tier else None,
+        "latency_target_s": latency_target_s
+    })
+    if not claimed:
+        return {"message": "音檔已在處理中", "session_id": session_id}
+    
+    # Identical audio with identical parameters already in flight: share its work
+    key = FlightRegistry.flight_key(
+        session_data["content_sha256"],
+        paper_title=session_data["paper_title"],
+        cost_tier=cost_tier.value if cost_tier else settings.route_default_cost_tier,
+        latency_target_s=latency_target_s,
+        whisper_timestamps=settings.whisper_timestamps
+    )
+    job_id = await flights.join(key, session_id)
+    if job_id is not None:
+        # A shared job runs at the highest priority of the sessions waiting on it;
+        # the job may be queued on another worker
+        await progress_manager.publish_control(job_id, {"action": "raise_priority", "priority": priority.value})
+        await attach_to_job(session_id, job_id)
+        return {"message": "相同音檔已在處理中，已合併處理", "session_id": session_id}
+    
+    # Keep the audio from being evicted while the job waits in the queue
+    await storage_manager.pin(session_data["file_path"])
+    job_scheduler.submit(
+        session_id, lambda: process_audio_background(session_id), priority
+    )
+    
+    position = job_scheduler.queue_position(session_id)
+    if position:
+        await progress_manager.update_progress(
+            session_id, ProcessingStatus.QUEUED, 0, f"排隊中，前方還有 {position - 1} 個工作"
+        )
     
     return {"message": "開始處理音檔", "session_id": session_id}
 
+# Job results copied to every session attached to the job
+SHARED_JOB_FIELDS = ("transcript", "segments", "summary", "tags", "routing", "obsidian_uri", "completed_at")
+
+async def attach_to_job(session_id: str, job_id: str):
+    """Bring a session that joined an in-flight job up to the job's current state"""
+    source = await progress_manager.get_session((await flights.sessions(job_id))[0])
+    shared = {field: source[field] for field in SHARED_JOB_FIELDS if field in source}
+    if "transcript" in shared:
+        # Transcription already ran without this session's audio; free it now
+        session_data = await progress_manager.get_session(session_id)
+        shared["audio_expires_at"] = storage_manager.release_after_transcription(session_data["file_path"])
+    await progress_manager.update_session(session_id, shared)
+    await progress_manager.update_progress(
+        session_id,
+        source.get("status", ProcessingStatus.QUEUED),
+        source.get("progress", 0),
+        "已合併至相同音檔的處理工作",
+        eta_seconds=source.get("eta_seconds")
+    )
+
+async def update_job_progress(
+    job_id: str,
+    status: ProcessingStatus,
+    progress: int,
+    message: str = "",
+    eta_seconds: Optional[float] = None
+):
+    """Publish progress to every session attached to a job"""
+    for session_id in await flights.sessions(job_id):
+        await progress_manager.update_progress(
+            session_id, status, progress, message, eta_seconds=eta_seconds
+        )
+
+async def update_job_sessions(job_id: str, data: Dict):
+    """Store job results on every session attached to a job"""
+    for session_id in await flights.sessions(job_id):
+        await progress_manager.update_session(session_id, data)
+
+@app.post("/api/cancel/{session_id}", response_model=Dict[str, str])
+async def cancel_processing(session_id: str):
+    """Cancel a queued or running job, aborting in-flight OpenAI requests"""
+    session_data = await progress_manager.get_session(session_id)
+    if not session_data:
+        raise HTTPException(status_code=404, detail="找不到指定的會話")
+    
+    if session_data.get("status") in (
+        ProcessingStatus.COMPLETED, ProcessingStatus.ERROR, ProcessingStatus.CANCELLED
+    ):
+        raise HTTPException(status_code=409, detail="此工作已結束，無法取消")
+    
+    if session_data.get("status") == ProcessingStatus.PENDING:
+        # Never submitted: nothing to stop
+        await progress_manager.update_progress(session_id, ProcessingStatus.CANCELLED, 0, "處理已取消")
+    elif await flights.leave(session_id):
+        # The session shared its job with others; it detaches and the job keeps running for them
+        await progress_manager.update_progress(session_id, ProcessingStatus.CANCELLED, 0, "處理已取消")
+    else:
+        # The job may run on another worker; every worker checks its own scheduler
+        await progress_manager.publish_control(session_id, {"action": "cancel"})
+    
+    return {"message": "已送出取消要求", "session_id": session_id}
+
+async def handle_control(session_id: str, payload: Dict):
+    """Apply control messages published by any worker"""
+    if payload.get("action") == "raise_priority":
+        # Only the worker that has the job queued acts on it
+        job_scheduler.raise_priority(session_id, JobPriority(payload["priority"]))
+        return
+    if payload.get("action") != "cancel":
+        return
+    
+    job_id = await flights.job_id(session_id)
+    where = job_scheduler.cancel(job_id)
+    if where == "queued":
+        await flights.finish(job_id)
+        job_data = await progress_manager.get_session(job_id)
+        if job_data:
+            await storage_manager.unpin(job_data["file_path"])
+        await progress_manager.update_progress(session_id, ProcessingStatus.CANCELLED, 0, "處理已取消")
+
+progress_manager.on_control(handle_control)
+
+async def run_stage(stage: str, coro, deadline_s: float):
+    """Await one pipeline stage, cancelling it once its deadline has passed"""
+    try:
+        return await asyncio.wait_for(coro, timeout=deadline_s)
+    except asyncio.TimeoutError:
+        raise Exception(f"{stage}逾時（超過 {deadline_s:g} 秒）")
+
+async def report_progress(session_id: str, plan: ProgressPlan, status: ProcessingStatus, message: str):
+    """Publish a stage transition with the plan's percentage and ETA"""
+    percentage, eta_seconds = plan.snapshot()
+    await update_job_progress(session_id, status, percentage, message, eta_seconds=eta_seconds)
+
+async def progress_ticker(session_id: str, plan: ProgressPlan):
+    """Republish interpolated progress and ETA while a stage is running"""
+    while True:
+        await asyncio.sleep(settings.progress_tick_interval_s)
+        if plan.running:
+            await report_progress(session_id, plan, plan.status, plan.message)
+
+async def stop_ticker(ticker: asyncio.Task):
+    """Stop the ticker so it cannot publish after the final status"""
+    ticker.cancel()
+    await asyncio.gather(ticker, return_exceptions=True)
+
 async def process_audio_background(session_id: str):
-    """Background task for audio processing"""
+    """Background task for audio processing
+    
+    Runs as the job of the session that started it; progress and results go
+    to every session attached to the job (see FlightRegistry).
+    """
+    ticker = None
     try:
-        session_data = progress_manager.get_session(session_id)
+        session_data = await progress_manager.get_session(session_id)
+        transcript = session_data.get("transcript")
+        audio_minutes = (session_data.get("audio_duration_s") or 0) / 60
+        
+        # Stage shares and ETA come from observed stage durations (fixed cost plus per audio-minute)
+        stages = (["transcription"] if not transcript else []) + ["summary", "import"]
+        plan = throughput_model.plan(stages, audio_minutes)
+        ticker = asyncio.create_task(progress_ticker(session_id, plan))
         
         # Step 1: Transcription
-        await progress_manager.update_progress(
-            session_id, ProcessingStatus.TRANSCRIBING, 10, "開始語音辨識..."
-        )
+        if not transcript:
+            plan.start("transcription", ProcessingStatus.TRANSCRIBING, "正在進行語音辨識...")
+            await report_progress(session_id, plan, ProcessingStatus.TRANSCRIBING, "開始語音辨識...")
+            
+            file_path = session_data["file_path"]
+            transcription = {}
+            if settings.whisper_timestamps:
+                transcript, segments = await run_stage(
+                    "語音辨識", get_whisper_service().transcribe_with_segments(file_path),
+                    settings.transcription_deadline_s
+                )
+                transcription["segments"] = segments.to_dict()
+            else:
+                transcript = await run_stage(
+                    "語音辨識", get_whisper_service().transcribe_audio(file_path),
+                    settings.transcription_deadline_s
+                )
+            throughput_model.observe("transcription", audio_minutes, plan.finish())
+            # The transcript is all later steps need; free the audio of every attached session
+            for member_id in await flights.sessions(session_id):
+                member_file = (await progress_manager.get_session(member_id))["file_path"]
+                await progress_manager.update_session(member_id, {
+                    **transcription,
+                    "transcript": transcript,
+                    "audio_expires_at": storage_manager.release_after_transcription(member_file)
+                })
         
-        transcript = await whisper_service.transcribe_audio(session_data["file_path"])
-        session_data["transcript"] = transcript
-        
-        await progress_manager.update_progress(
-            session_id, ProcessingStatus.TRANSCRIBING, 25, "語音辨識完成"
-        )
+        await report_progress(session_id, plan, ProcessingStatus.TRANSCRIBING, "語音辨識完成")
         
         # Step 2: Summarization
-        await progress_manager.update_progress(
-            session_id, ProcessingStatus.SUMMARIZING, 30, "開始生成摘要..."
-        )
+        plan.start("summary", ProcessingStatus.SUMMARIZING, "正在生成摘要...")
+        await report_progress(session_id, plan, ProcessingStatus.SUMMARIZING, "開始生成摘要...")
         
-        summary = await chatgpt_service.generate_summary(
-            transcript, session_data["paper_title"]
+        summary, routing = await run_stage(
+            "摘要生成",
+            get_chatgpt_service().generate_summary_routed(
+                transcript, session_data["paper_title"],
+                cost_tier=session_data.get("cost_tier"),
+                latency_target_s=session_data.get("latency_target_s")
+            ),
+            settings.summary_deadline_s
         )
-        session_data["summary"] = summary
+        # Tags are best effort: generate_tags returns [] when the request fails
+        try:
+            tags = await asyncio.wait_for(
+                get_chatgpt_service().generate_tags(summary), timeout=settings.tags_deadline_s
+            )
+        except asyncio.TimeoutError:
+            tags = []
+        throughput_model.observe("summary", audio_minutes, plan.finish())
+        await update_job_sessions(session_id, {"summary": summary, "tags": tags, "routing": routing})
         
-        await progress_manager.update_progress(
-            session_id, ProcessingStatus.SUMMARIZING, 50, "摘要生成完成"
-        )
+        await report_progress(session_id, plan, ProcessingStatus.SUMMARIZING, "摘要生成完成")
         
         # Step 3: Auto-import to Obsidian
-        await progress_manager.update_progress(
-            session_id, ProcessingStatus.IMPORTING, 75, "正在匯入Obsidian..."
-        )
+        plan.start("import", ProcessingStatus.IMPORTING, "正在匯入Obsidian...")
+        await report_progress(session_id, plan, ProcessingStatus.IMPORTING, "正在匯入Obsidian...")
         
         # Auto-generate Obsidian URI and complete the process
         try:
             # Add small delay to show progress transition
             await asyncio.sleep(0.5)
             
-            uri = obsidian_service.generate_uri(
+            # URI encoding of the whole note is CPU-bound; keep it off the loop
+            uri = await run_blocking(
+                get_obsidian_service().generate_uri,
                 title=session_data["paper_title"],
                 content=summary,
+                tags=tags,
                 validate=False  # Skip validation in background task to avoid blocking
             )
+            throughput_model.observe("import", audio_minutes, plan.finish())
             
             # Store Obsidian URI in session data
-            session_data["obsidian_uri"] = uri
+            await update_job_sessions(session_id, {
+                "obsidian_uri": uri,
+                "completed_at": datetime.now().isoformat()
+            })
             
-            await progress_manager.update_progress(
-                session_id, ProcessingStatus.COMPLETED, 100, "已成功匯入Obsidian！"
+            await stop_ticker(ticker)
+            await update_job_progress(
+                session_id, ProcessingStatus.COMPLETED, 100, "已成功匯入Obsidian！", eta_seconds=0
             )
             
         except Exception as obsidian_error:
             # If Obsidian integration fails, still mark as complete but with warning
-            await progress_manager.update_progress(
-                session_id, ProcessingStatus.COMPLETED, 90, f"摘要完成，Obsidian匯入發生錯誤：{str(obsidian_error)}"
+            await update_job_sessions(session_id, {"completed_at": datetime.now().isoformat()})
+            await stop_ticker(ticker)
+            await update_job_progress(
+                session_id, ProcessingStatus.COMPLETED, 90, f"摘要完成，Obsidian匯入發生錯誤：{str(obsidian_error)}",
+                eta_seconds=0
             )
         
+        try:
+            await run_blocking(throughput_model.save)
+        except OSError as e:
+            print(f"Failed to save ETA model: {e}")
+        
+    except asyncio.CancelledError:
+        if ticker:
+            await stop_ticker(ticker)
+        await update_job_progress(session_id, ProcessingStatus.CANCELLED, 0, "處理已取消")
+        raise
     except Exception as e:
-        await progress_manager.update_progress(
-            session_id, ProcessingStatus.ERROR, 0, f"處理失敗：{str(e)}"
-        )
+        if ticker:
+            await stop_ticker(ticker)
+        await update_job_progress(session_id, ProcessingStatus.ERROR, 0, f"處理失敗：{str(e)}")
+    finally:
+        await flights.finish(session_id)
+        # Pinned when the job was queued
+        await storage_manager.unpin((await progress_manager.get_session(session_id))["file_path"])
+
+RESULT_FIELDS = (
+    "session_id", "status", "transcript", "summary", "paper_title", "obsidian_uri", "version",
+    "routing"
+)
+OPTIONAL_RESULT_FIELDS = ("progress", "message", "transcript_length", "eta_seconds", "audio_duration_s", "tags")
+
+def parse_result_fields(fields: Optional[str]) -> List[str]:
+    """Parse a comma-separated ``fields=`` selector"""
+    if not fields:
+        return list(RESULT_FIELDS)
+    
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in RESULT_FIELDS + OPTIONAL_RESULT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支援的欄位：{', '.join(unknown)}")
+    return selected
+
+def conditional_response(request: Request, etag: str, build_body) -> Response:
+    """Return 304 when the client's If-None-Match matches, otherwise the JSON body"""
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return JSONResponse(build_body(), headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+# Fields that change with every progress update; they only feed an ETag when the response includes them
+PROGRESS_FIELDS = ("status", "progress", "message", "eta_seconds")
+
+def session_etag(
+    session_id: str, session_data: Dict, variant: str, progress_fields: Sequence[str] = ()
+) -> str:
+    # content_version changes only when a job result changes; the variant distinguishes representations
+    progress = json.dumps([session_data.get(field) for field in progress_fields], default=str)
+    checksum = zlib.crc32(f"{session_id}|{variant}|{progress}".encode())
+    return f'"{session_data.get("content_version", 0)}-{checksum:08x}"'
 
 @app.get("/api/result/{session_id}")
-async def get_result(session_id: str):
-    """Get processing result"""
-    session_data = progress_manager.get_session(session_id)
+async def get_result(session_id: str, request: Request, fields: Optional[str] = None):
+    """Get processing result (supports ETag / If-None-Match and fields= selection)"""
+    session_data = await progress_manager.get_session(session_id)
     if not session_data:
         raise HTTPException(status_code=404, detail="找不到指定的會話")
     
-    return {
-        "session_id": session_id,
-        "status": session_data.get("status", ProcessingStatus.PENDING),
-        "transcript": session_data.get("transcript", ""),
-        "summary": session_data.get("summary", ""),
-        "paper_title": session_data.get("paper_title", ""),
-        "obsidian_uri": session_data.get("obsidian_uri", "")
-    }
+    selected = parse_result_fields(fields)
+    
+    def build_body():
+        values = {
+            "session_id": session_id,
+            "status": session_data.get("status", ProcessingStatus.PENDING),
+            "transcript": session_data.get("transcript", ""),
+            "summary": session_data.get("summary", ""),
+            "paper_title": session_data.get("paper_title", ""),
+            "obsidian_uri": session_data.get("obsidian_uri", ""),
+            "version": session_data.get("content_version", 0),
+            "routing": session_data.get("routing"),
+            "progress": session_data.get("progress", 0),
+            "message": session_data.get("message", ""),
+            "transcript_length": len(session_data.get("transcript", "")),
+            "eta_seconds": session_data.get("eta_seconds"),
+            "audio_duration_s": session_data.get("audio_duration_s"),
+            "tags": session_data.get("tags", [])
+        }
+        return {name: values[name] for name in selected}
+    
+    return conditional_response(
+        request,
+        session_etag(
+            session_id, session_data, ",".join(selected),
+            [field for field in PROGRESS_FIELDS if field in selected]
+        ),
+        build_body
+    )
+
+@app.get("/api/result/{session_id}/transcript")
+async def get_transcript_page(
+    session_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(5000, ge=1, le=100000)
+):
+    """Get a page of the transcript (character offsets)"""
+    session_data = await progress_manager.get_session(session_id)
+    if not session_data:
+        raise HTTPException(status_code=404, detail="找不到指定的會話")
+    
+    def build_body():
+        transcript = session_data.get("transcript", "")
+        end = min(offset + limit, len(transcript))
+        return {
+            "session_id": session_id,
+            "offset": offset,
+            "limit": limit,
+            "total_length": len(transcript),
+            "next_offset": end if end < len(transcript) else None,
+            "text": transcript[offset:end]
+        }
+    
+    return conditional_response(
+        request, session_etag(session_id, session_data, f"transcript:{offset}:{limit}"), build_body
+    )
+
+@app.get("/api/result/{session_id}/segments")
+async def get_transcript_segments(
+    session_id: str,
+    request: Request,
+    start: float = Query(0, ge=0, description="起始時間（秒）"),
+    end: Optional[float] = Query(None, gt=0, description="結束時間（秒），預設至結尾")
+):
+    """Get timestamped transcript segments overlapping [start, end)"""
+    session_data = await progress_manager.get_session(session_id)
+    if not session_data:
+        raise HTTPException(status_code=404, detail="找不到指定的會話")
+    if not session_data.get("segments"):
+        raise HTTPException(status_code=404, detail="此會話沒有時間軸資料")
+    
+    def build_body():
+        segments = TranscriptSegments.from_dict(session_data["segments"])
+        window_end = end if end is not None else segments.duration + 1
+        return {
+            "session_id": session_id,
+            "start": start,
+            "end": window_end,
+            "total_segments": len(segments),
+            "duration": round(segments.duration, 3),
+            "segments": segments.time_range(start, window_end)
+        }
+    
+    return conditional_response(
+        request, session_etag(session_id, session_data, f"segments:{start}:{end}"), build_body
+    )
 
 @app.post("/api/obsidian/save", response_model=ObsidianSaveResponse)
 async def save_to_obsidian(request: ObsidianSaveRequest):
     """Generate Obsidian URI for saving note"""
     try:
-        uri = obsidian_service.generate_uri(
+        # Installation probing and URI encoding both block; run them in the pool
+        uri = await run_blocking(
+            get_obsidian_service().generate_uri,
             title=request.paper_title,
             content=request.content,
             vault_name=request.vault_name,
@@ -242,7 +854,7 @@ async def save_to_obsidian(request: ObsidianSaveRequest):
         session_id = getattr(request, 'session_id', None)
         if not session_id:
             # Fallback: Find session ID by content match (legacy support)
-            for sid, data in progress_manager.sessions.items():
+            for sid, data in await progress_manager.iter_sessions():
                 if data.get("summary") and request.content in data.get("summary", ""):
                     session_id = sid
                     break
@@ -265,15 +877,106 @@ async def save_to_obsidian(request: ObsidianSaveRequest):
             message=f"生成失敗：{str(e)}"
         )
 
+EXPORT_FORMATS = {
+    "zip": (stream_zip, "application/zip", "zip"),
+    "tar": (stream_tar_gz, "application/gzip", "tar.gz")
+}
+
+@app.get("/api/export")
+async def export_notes(
+    format: str = Query("zip", pattern="^(zip|tar)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    tag: Optional[List[str]] = Query(None),
+    since_last: bool = False,
+    cursor: str = Query("default", pattern=r"^[\w-]{1,64}$")
+):
+    """Stream completed notes as a vault-ready archive
+    
+    Notes are rendered exactly as the Obsidian URI would save them, at
+    their default_paper_path paths, so the archive can be unpacked into the
+    vault root. The archive is built while it is sent.
+    
+    Filters: completion date range (start/end, inclusive) and tags (a note
+    matches if it has any of them). With since_last, only notes completed
+    after the previous since_last export with the same cursor name are
+    included; the cursor advances once the archive has been fully sent.
+    Each combination of filters keeps its own cursor position.
+    """
+    cursor = cursor_key(cursor, start, end, tag)
+    since = await run_blocking(export_cursors.get, cursor) if since_last else None
+    
+    # Filter on metadata only; each summary is loaded while its note is written
+    selected = []
+    for session_id, data in await progress_manager.iter_sessions(include_large=False):
+        if data.get("status") != ProcessingStatus.COMPLETED:
+            continue
+        if not data.get("completed_at"):
+            continue
+        completed_at = datetime.fromisoformat(data["completed_at"])
+        if (start and completed_at.date() < start) or (end and completed_at.date() > end):
+            continue
+        if since and completed_at <= since:
+            continue
+        tags = data.get("tags") or []
+        if tag and not set(tag) & set(DEFAULT_NOTE_TAGS + tags):
+            continue
+        selected.append((completed_at, session_id, data["paper_title"], tags))
+    selected.sort(key=lambda note: note[0])
+    
+    def render_notes():
+        obsidian_service = get_obsidian_service()
+        used_paths: Dict[str, int] = {}
+        seen = set()
+        for completed_at, session_id, title, tags in selected:
+            # Runs in Starlette's thread pool; the store is read on the event loop
+            summary = anyio.from_thread.run(progress_manager.get_session_field, session_id, "summary")
+            if not summary:
+                continue
+            path = obsidian_service.note_path(title)
+            content = obsidian_service.render_note(title, summary, tags, completed_at)
+            # Sessions that shared one job carry identical notes; keep only digests
+            digest = (path, hashlib.sha256(content.encode("utf-8")).digest())
+            if digest in seen:
+                continue
+            seen.add(digest)
+            yield unique_path(path, used_paths), content.encode("utf-8"), completed_at
+    
+    stream_archive, media_type, extension = EXPORT_FORMATS[format]
+    
+    def archive_chunks():
+        # A sync generator: Starlette iterates it in the thread pool
+        yield from stream_archive(render_notes())
+        if since_last and selected:
+            export_cursors.advance(cursor, selected[-1][0])
+    
+    file_name = f"obsidian-notes-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{extension}"
+    return StreamingResponse(
+        archive_chunks(),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{file_name}"',
+            # Already compressed; keeps GZipMiddleware from compressing it again
+            "Content-Encoding": "identity"
+        }
+    )
+
 # WebSocket endpoint for real-time progress
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
-    await progress_manager.connect(websocket, session_id)
+    if not await progress_manager.connect(websocket, session_id):
+        return
     try:
         while True:
-            await websocket.receive_text()  # Keep connection alive
+            message = await websocket.receive_text()
+            progress_manager.touch(websocket)
+            if message == "ping":
+                # Application-level keepalive for clients that cannot see protocol pings
+                await websocket.send_text("pong")
     except WebSocketDisconnect:
-        progress_manager.disconnect(session_id)
+        pass
+    finally:
+        progress_manager.disconnect(websocket)
 
 def find_available_port(start_port: int = 8000, max_attempts: int = 10) -> int:
     """Find an available port starting from start_port"""
@@ -290,6 +993,8 @@ def find_available_port(start_port: int = 8000, max_attempts: int = 10) -> int:
     raise RuntimeError(f"No available port found in range {start_port}-{start_port + max_attempts}")
 
 if __name__ == "__main__":
+    import uvicorn
+    
     try:
         # Try to use configured port, or find an available one
         port = settings.port
@@ -308,11 +1013,21 @@ if __name__ == "__main__":
         print(f"📋 Health check: http://localhost:{port}/api/health")
         print(f"📚 API docs: http://localhost:{port}/docs")
         
+        if settings.workers > 1 and settings.state_backend == "memory":
+            print("⚠️  Multiple workers with state_backend=memory: sessions will not be shared between workers")
+        
+        # uvicorn cannot combine --reload with multiple workers
+        multi_worker = settings.workers > 1
         uvicorn.run(
             "main:app",
             host=settings.host,
             port=port,
-            reload=settings.debug
+            reload=settings.debug and not multi_worker,
+            workers=settings.workers if multi_worker else None,
+            ws_ping_interval=settings.ws_ping_interval_s,
+            ws_ping_timeout=settings.ws_ping_timeout_s,
+            ws_max_size=settings.ws_max_message_bytes,
+            ws_per_message_deflate=settings.ws_per_message_deflate
         )
     except Exception as e:
         print(f"❌ Failed to start server: {e}")
@@ -4,18 +4,42 @@ from enum import Enum
 
 class ProcessingStatus(str, Enum):
     PENDING = "待命中"
+    QUEUED = "排隊等待處理..."
     UPLOADING = "正在上傳..."
     TRANSCRIBING = "1/4 正在進行語音辨識..."
     SUMMARIZING = "2/4 正在生成重點摘要..."
     IMPORTING = "3/4 正在匯入Obsidian..."
     COMPLETED = "4/4 完成！"
     ERROR = "錯誤！"
+    CANCELLED = "已取消"
+
+class JobPriority(str, Enum):
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+class CostTier(str, Enum):
+    ECONOMY = "economy"
+    BALANCED = "balanced"
+    QUALITY = "quality"
 
 class AudioUploadRequest(BaseModel):
     paper_title: str = Field(..., description="論文標題")
     file_name: str = Field(..., description="音檔檔名")
     file_size: int = Field(..., description="檔案大小 (bytes)")
 
+class ResumableUploadCreateRequest(BaseModel):
+    file_name: str = Field(..., description="音檔檔名")
+    file_size: int = Field(..., gt=0, description="檔案大小 (bytes)")
+    paper_title: str = Field("", description="論文標題")
+
+class ResumableUploadStatus(BaseModel):
+    upload_id: str
+    file_name: str
+    file_size: int
+    offset: int
+    chunk_size: int
+    completed: bool = False
+
 class TranscriptionResponse(BaseModel):
     session_id: str
     transcript: str
@@ -49,6 +73,7 @@ class ProgressUpdate(BaseModel):
     status: ProcessingStatus
     progress_percentage: int = Field(ge=0, le=100)
     message: Optional[str] = None
+    eta_seconds: Optional[float] = None  # Estimated time to completion
     data: Optional[Dict[str, Any]] = None
 
 class ErrorResponse(BaseModel):
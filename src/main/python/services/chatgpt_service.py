@@ -1,17 +1,97 @@
+import time
 import openai
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from config.settings import settings
+from services.hedging import request_hedger, size_class
+from services.model_router import ModelRouter
+
+# Prompts are laid out for provider prompt caching: every request starts with a
+# byte-identical static system message, and everything that varies per request
+# (title, transcript, summary, feedback, counts) goes in the final user message.
+# Keep these constants free of per-request formatting.
+# Note: OpenAI only caches prefixes of at least 1024 tokens. The static
+# prefixes here are about 435 (summary), 130 (tags) and 80 (refine) tokens,
+# so none of them is cached today; cached_tokens in the usage metrics shows
+# whether that changes. Padding them just to reach the minimum costs more
+# than the cache discount saves.
+
+ACADEMIC_SUMMARY_PROMPT = """# Role: 學術研究助理
+
+## Context:
+你是一位專業的學術研究助理。我剛剛收聽了一段關於一篇學術論文的 Podcast，並使用 Whisper 取得了以下的逐字稿。
+
+## Task:
+請你根據這份逐字稿，為我整理出一份結構清晰、條理分明的論文重點筆記。筆記必須使用繁體中文和 Markdown 格式。
+
+## Output Format (輸出格式要求):
+請嚴格遵循以下 Markdown 結構來組織你的回答，如果某些部分資訊不足，可以留空或標示「資訊不明」：
+
+### 核心問題 (Problem Statement)
+- (這裡簡述這篇論文試圖解決的核心問題或研究目標。)
+
+### 研究方法 (Methodology)
+- (這裡描述論文所使用的主要研究方法、實驗設計、數據集或理論框架。)
+
+### 主要發現 (Key Findings)
+- (以點列方式，條列出 2-4 個最關鍵的實驗結果或發現。)
+
+### 結論與未來展望 (Conclusion & Future Work)
+- (總結這篇論文的貢獻，以及作者提到的未來研究方向或限制。)
+
+## 重要指示:
+1. 請保持客觀中性的學術語調
+2. 重點突出關鍵資訊，避免冗長描述
+3. 如果逐字稿中有不清楚的部分，請根據上下文合理推測
+4. 確保輸出的 Markdown 格式正確且易讀"""
+
+SUMMARY_SYSTEM_ROLE = "你是一位專業的學術研究助理，擅長分析學術論文內容並生成結構化的重點摘要。"
+
+SUMMARY_SYSTEM_PROMPT = f"""{SUMMARY_SYSTEM_ROLE}
+
+{ACADEMIC_SUMMARY_PROMPT}"""
+
+TAGS_SYSTEM_PROMPT = """你是一位專業的學術分類專家，擅長為論文生成精準的關鍵字標籤。
+
+請基於使用者提供的論文摘要生成關鍵字標籤。
+標籤應該是:
+1. 簡潔的中文詞彙（2-6個字）
+2. 能夠代表論文的主要主題或技術
+3. 有助於在 Obsidian 中進行分類和檢索
+
+請只返回標籤列表，每個標籤一行，格式如下:
+- 標籤1
+- 標籤2
+- 標籤3"""
+
+REFINE_SYSTEM_PROMPT = """你是一位專業的學術編輯，擅長根據回饋改進學術文獻摘要。
+
+請根據使用者的回饋，改進使用者提供的學術論文摘要。
+請保持原有的 Markdown 結構，並根據回饋進行適當的修改或補充。"""
+
+# Errors the SDK would retry by itself. When a summary request has a fallback
+# model, SDK retries are off and the fallback model is the retry.
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
 
 class ChatGPTService:
     """Service for OpenAI ChatGPT API integration"""
     
     def __init__(self):
-        if not settings.openai_api_key:
-            raise Exception("OpenAI API key not found. Please check your .env file.")
-        self.client = openai.AsyncOpenAI(
-            api_key=settings.openai_api_key,
-            timeout=60.0  # 60 seconds timeout
-        )
+        self._client = None
+        # operation -> token and latency counters, including prompt-cache hits
+        self.usage_stats: Dict[str, Dict[str, float]] = {}
+        self.router = ModelRouter()
+    
+    @property
+    def client(self):
+        """OpenAI client, created on first use so the app can boot without an API key"""
+        if self._client is None:
+            if not settings.openai_api_key:
+                raise Exception("OpenAI API key not found. Please check your .env file.")
+            self._client = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                timeout=60.0  # 60 seconds timeout
+            )
+        return self._client
     
     async def generate_summary(
         self, 
@@ -30,14 +110,41 @@ class ChatGPTService:
         Returns:
             Structured summary in Markdown format
         """
-        try:
-            # Use custom prompt or default academic prompt
-            prompt = custom_prompt or self._get_default_academic_prompt()
+        summary, _ = await self.generate_summary_routed(transcript, paper_title, custom_prompt)
+        return summary
+    
+    async def generate_summary_routed(
+        self, 
+        transcript: str, 
+        paper_title: str,
+        custom_prompt: Optional[str] = None,
+        cost_tier: Optional[str] = None,
+        latency_target_s: Optional[float] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Generate a summary with the model and max_tokens chosen by the router
+        
+        Args:
+            transcript: Transcribed text from audio
+            paper_title: Title of the paper for context
+            custom_prompt: Optional custom prompt template
+            cost_tier: "economy", "balanced" or "quality"
+            latency_target_s: Optional latency target in seconds
             
-            # Format the complete prompt with transcript
-            complete_prompt = f"""{prompt}
+        Returns:
+            Tuple of (summary, routing decision including attempts and fallbacks)
+        """
+        try:
+            # Static prefix: identical for every call with the same prompt template
+            if custom_prompt:
+                system_prompt = f"""{SUMMARY_SYSTEM_ROLE}
 
-## 論文標題參考
+{custom_prompt}"""
+            else:
+                system_prompt = SUMMARY_SYSTEM_PROMPT
+            
+            # Variable part last
+            user_content = f"""## 論文標題參考
 {paper_title}
 
 ## 原始逐字稿內容如下:
@@ -45,24 +152,67 @@ class ChatGPTService:
 {transcript}
 \"\"\""""
 
-            # Call ChatGPT API
-            response = await self.client.chat.completions.create(
-                model=settings.chatgpt_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一位專業的學術研究助理，擅長分析學術論文內容並生成結構化的重點摘要。"
-                    },
-                    {
-                        "role": "user", 
-                        "content": complete_prompt
-                    }
-                ],
-                max_tokens=settings.max_tokens,
-                temperature=settings.temperature
-            )
+            messages = [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user", 
+                    "content": user_content
+                }
+            ]
             
-            return response.choices[0].message.content.strip()
+            routing = self.router.route(transcript, cost_tier, latency_target_s)
+            models = [routing["model"]] + routing["fallbacks"]
+            
+            for index, model in enumerate(models):
+                has_fallback = index < len(models) - 1
+                # With a fallback available, move on to it instead of waiting for SDK retries
+                options = {"timeout": settings.route_timeout_s, "max_retries": 0} if has_fallback else {}
+                start = time.perf_counter()
+                try:
+                    # Call ChatGPT API
+                    response = await self._create_completion(
+                        "summary",
+                        messages=messages,
+                        model=model,
+                        max_tokens=routing["max_tokens"],
+                        temperature=settings.temperature,
+                        hedge_key=f"summary:{model}:{size_class(len(user_content))}",
+                        **options
+                    )
+                except openai.APITimeoutError:
+                    elapsed = time.perf_counter() - start
+                    # The model was at least as slow as the timeout
+                    self.router.observe(model, max(elapsed, settings.route_timeout_s), None, timed_out=True)
+                    routing["attempts"].append(
+                        {"model": model, "outcome": "timeout", "latency_s": round(elapsed, 2)}
+                    )
+                    if not has_fallback:
+                        raise
+                    continue
+                except RETRYABLE_ERRORS as e:
+                    elapsed = time.perf_counter() - start
+                    routing["attempts"].append({
+                        "model": model,
+                        "outcome": "error",
+                        "error": type(e).__name__,
+                        "latency_s": round(elapsed, 2)
+                    })
+                    if not has_fallback:
+                        raise
+                    continue
+                
+                elapsed = time.perf_counter() - start
+                completion_tokens = response.usage.completion_tokens if response.usage else None
+                self.router.observe(model, elapsed, completion_tokens)
+                routing["attempts"].append(
+                    {"model": model, "outcome": "ok", "latency_s": round(elapsed, 2)}
+                )
+                routing["final_model"] = model
+                routing["fallback_used"] = index > 0
+                return response.choices[0].message.content.strip(), routing
             
         except openai.APIConnectionError as e:
             raise Exception(f"網路連接失敗，請檢查網路連線: {str(e)}")
@@ -73,34 +223,7 @@ class ChatGPTService:
     
     def _get_default_academic_prompt(self) -> str:
         """Get the default academic summary prompt template"""
-        return """# Role: 學術研究助理
-
-## Context:
-你是一位專業的學術研究助理。我剛剛收聽了一段關於一篇學術論文的 Podcast，並使用 Whisper 取得了以下的逐字稿。
-
-## Task:
-請你根據這份逐字稿，為我整理出一份結構清晰、條理分明的論文重點筆記。筆記必須使用繁體中文和 Markdown 格式。
-
-## Output Format (輸出格式要求):
-請嚴格遵循以下 Markdown 結構來組織你的回答，如果某些部分資訊不足，可以留空或標示「資訊不明」：
-
-### 核心問題 (Problem Statement)
-- (這裡簡述這篇論文試圖解決的核心問題或研究目標。)
-
-### 研究方法 (Methodology)
-- (這裡描述論文所使用的主要研究方法、實驗設計、數據集或理論框架。)
-
-### 主要發現 (Key Findings)
-- (以點列方式，條列出 2-4 個最關鍵的實驗結果或發現。)
-
-### 結論與未來展望 (Conclusion & Future Work)
-- (總結這篇論文的貢獻，以及作者提到的未來研究方向或限制。)
-
-## 重要指示:
-1. 請保持客觀中性的學術語調
-2. 重點突出關鍵資訊，避免冗長描述
-3. 如果逐字稿中有不清楚的部分，請根據上下文合理推測
-4. 確保輸出的 Markdown 格式正確且易讀"""
+        return ACADEMIC_SUMMARY_PROMPT
     
     async def generate_tags(self, summary: str, max_tags: int = 5) -> list:
         """
@@ -114,30 +237,19 @@ class ChatGPTService:
             List of relevant tags
         """
         try:
-            prompt = f"""基於以下論文摘要，請生成 {max_tags} 個最相關的關鍵字標籤。
-標籤應該是:
-1. 簡潔的中文詞彙（2-6個字）
-2. 能夠代表論文的主要主題或技術
-3. 有助於在 Obsidian 中進行分類和檢索
-
-論文摘要:
-{summary}
-
-請只返回標籤列表，每個標籤一行，格式如下:
-- 標籤1
-- 標籤2
-- 標籤3"""
-
-            response = await self.client.chat.completions.create(
-                model=settings.chatgpt_model,
+            response = await self._create_completion(
+                "tags",
                 messages=[
                     {
                         "role": "system",
-                        "content": "你是一位專業的學術分類專家，擅長為論文生成精準的關鍵字標籤。"
+                        "content": TAGS_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": f"""請生成 {max_tags} 個最相關的關鍵字標籤。
+
+論文摘要:
+{summary}"""
                     }
                 ],
                 max_tokens=200,
@@ -172,26 +284,20 @@ class ChatGPTService:
             Refined summary
         """
         try:
-            prompt = f"""請根據使用者的回饋，改進以下學術論文摘要。
-
-原始摘要:
-{original_summary}
-
-使用者回饋:
-{user_feedback}
-
-請保持原有的 Markdown 結構，並根據回饋進行適當的修改或補充。"""
-
-            response = await self.client.chat.completions.create(
-                model=settings.chatgpt_model,
+            response = await self._create_completion(
+                "refine",
                 messages=[
                     {
                         "role": "system",
-                        "content": "你是一位專業的學術編輯，擅長根據回饋改進學術文獻摘要。"
+                        "content": REFINE_SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": f"""原始摘要:
+{original_summary}
+
+使用者回饋:
+{user_feedback}"""
                     }
                 ],
                 max_tokens=settings.max_tokens,
@@ -201,4 +307,68 @@ class ChatGPTService:
             return response.choices[0].message.content.strip()
             
         except Exception as e:
-            raise Exception(f"摘要改進失敗: {str(e)}")
\ No newline at end of file
+            raise Exception(f"摘要改進失敗: {str(e)}")
+    
+    async def _create_completion(
+        self, 
+        operation: str, 
+        messages: List[Dict[str, str]], 
+        model: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        hedge_key: Optional[str] = None,
+        **kwargs
+    ) -> Any:
+        """Call the chat completions API and record token usage for the operation
+        
+        With hedge_key, the call goes through the request hedger, which may
+        issue a duplicate if it runs past the p95 latency for that key.
+        """
+        client = self.client if max_retries is None else self.client.with_options(max_retries=max_retries)
+        request = lambda: client.chat.completions.create(
+            model=model or settings.chatgpt_model,
+            messages=messages,
+            **kwargs
+        )
+        start = time.perf_counter()
+        response = await (request_hedger.run(hedge_key, request) if hedge_key else request())
+        self._record_usage(operation, response, time.perf_counter() - start)
+        return response
+    
+    def _record_usage(self, operation: str, response: Any, elapsed: float):
+        stats = self.usage_stats.setdefault(operation, {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+            "total_latency_s": 0.0
+        })
+        stats["requests"] += 1
+        stats["total_latency_s"] += elapsed
+        
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        stats["prompt_tokens"] += usage.prompt_tokens or 0
+        stats["completion_tokens"] += usage.completion_tokens or 0
+        
+        # prompt_tokens_details is newer than the pinned SDK; it arrives as an
+        # extra field (dict) on older versions and as a model on newer ones
+        details = getattr(usage, "prompt_tokens_details", None)
+        if isinstance(details, dict):
+            cached = details.get("cached_tokens")
+        else:
+            cached = getattr(details, "cached_tokens", None)
+        stats["cached_tokens"] += cached or 0
+    
+    def usage_snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Token usage per operation, including prompt-cache hit ratio"""
+        snapshot = {}
+        for operation, stats in self.usage_stats.items():
+            snapshot[operation] = {
+                **stats,
+                "total_latency_s": round(stats["total_latency_s"], 3),
+                "avg_latency_s": round(stats["total_latency_s"] / stats["requests"], 3),
+                "cache_hit_ratio": round(stats["cached_tokens"] / stats["prompt_tokens"], 4)
+                if stats["prompt_tokens"] else 0.0
+            }
+        return snapshot
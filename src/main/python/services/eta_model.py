@@ -0,0 +1,159 @@
+import os
+import json
+import time
+from collections import deque
+from statistics import median
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+class ThroughputModel:
+    """Rolling estimate of each stage's duration as fixed seconds plus seconds per audio-minute
+
+    Transcription scales with the audio, while the summary is bounded by its
+    max_tokens and the import is mostly a fixed delay, so a single
+    seconds-per-minute rate would grossly overestimate those for short clips.
+    Each stage keeps its last WINDOW (audio minutes, seconds) observations
+    and fits a line with median-based estimators (Theil-Sen), so a single
+    stalled request does not skew it. Stages with fewer than MIN_FIT_SAMPLES
+    distinct audio lengths keep their prior slope and only fit the fixed
+    cost. Unobserved stages use PRIORS. Observations are persisted as JSON
+    so estimates survive restarts.
+    """
+
+    # stage -> (fixed seconds, seconds per audio-minute)
+    PRIORS = {"transcription": (2.0, 6.0), "summary": (8.0, 0.0), "import": (0.6, 0.0)}
+    MIN_STAGE_SECONDS = 1.0
+    MIN_FIT_SAMPLES = 5
+    WINDOW = 50
+
+    def __init__(self, path: str):
+        self.path = path
+        self.samples: Dict[str, Deque[Tuple[float, float]]] = {}
+
+    def load(self):
+        """Load persisted observations (missing or unreadable files are ignored)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Failed to load ETA model: {e}")
+            return
+        for stage, samples in data.get("samples", {}).items():
+            # Older files stored bare seconds-per-minute rates, which cannot be split
+            pairs = [tuple(sample) for sample in samples if isinstance(sample, list) and len(sample) == 2]
+            self.samples[stage] = deque(pairs[-self.WINDOW:], maxlen=self.WINDOW)
+
+    def save(self):
+        """Persist observations atomically (blocking; run in the thread pool)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"samples": {stage: list(samples) for stage, samples in self.samples.items()}}, f)
+        os.replace(temp_path, self.path)
+
+    def coefficients(self, stage: str) -> Tuple[float, float]:
+        """
+        Fitted model for a stage
+
+        Returns:
+            Tuple of (fixed seconds, seconds per audio-minute)
+        """
+        prior_fixed, prior_slope = self.PRIORS[stage]
+        samples = self.samples.get(stage)
+        if not samples:
+            return prior_fixed, prior_slope
+
+        slope = prior_slope
+        if len({minutes for minutes, _ in samples}) >= self.MIN_FIT_SAMPLES:
+            slopes = [
+                (s2 - s1) / (m2 - m1)
+                for i, (m1, s1) in enumerate(samples)
+                for m2, s2 in list(samples)[i + 1:]
+                if m2 != m1
+            ]
+            slope = max(0.0, median(slopes))
+        fixed = max(0.0, median(seconds - slope * minutes for minutes, seconds in samples))
+        return fixed, slope
+
+    def estimate(self, stage: str, audio_minutes: float) -> float:
+        """Estimated seconds for a stage on audio_minutes of audio"""
+        fixed, slope = self.coefficients(stage)
+        return max(self.MIN_STAGE_SECONDS, fixed + slope * audio_minutes)
+
+    def observe(self, stage: str, audio_minutes: float, seconds: float):
+        """Record how long a stage took for audio_minutes of audio"""
+        if audio_minutes <= 0:
+            return
+        self.samples.setdefault(stage, deque(maxlen=self.WINDOW)).append((audio_minutes, seconds))
+
+    def plan(self, stages: List[str], audio_minutes: float) -> "ProgressPlan":
+        """Progress plan for a job running the given stages in order"""
+        return ProgressPlan([(stage, self.estimate(stage, audio_minutes)) for stage in stages])
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        snapshot = {}
+        for stage in self.PRIORS:
+            fixed, slope = self.coefficients(stage)
+            snapshot[stage] = {
+                "fixed_seconds": round(fixed, 3),
+                "seconds_per_audio_minute": round(slope, 3),
+                "samples": len(self.samples.get(stage, ()))
+            }
+        return snapshot
+
+class ProgressPlan:
+    """Stage-weighted progress percentage and ETA for one job
+
+    Each stage's share of the progress bar is its estimated duration. While
+    a stage runs, its share fills with elapsed time but stops at STAGE_CAP
+    until the stage actually finishes, so the bar never runs ahead of the
+    work. ``status`` and ``message`` are what a ticker republishes between
+    stage transitions.
+    """
+
+    STAGE_CAP = 0.95
+
+    def __init__(self, estimates: List[Tuple[str, float]]):
+        self.estimates = estimates
+        self.total = sum(seconds for _, seconds in estimates) or 1.0
+        self.index = 0
+        self.stage_started: Optional[float] = None
+        self.status: Any = None
+        self.message = ""
+
+    @property
+    def running(self) -> bool:
+        return self.stage_started is not None
+
+    def start(self, stage: str, status: Any, message: str):
+        self.index = [name for name, _ in self.estimates].index(stage)
+        self.stage_started = time.monotonic()
+        self.status = status
+        self.message = message
+
+    def finish(self) -> float:
+        """Mark the running stage done and return how long it took"""
+        elapsed = time.monotonic() - self.stage_started
+        self.stage_started = None
+        self.index += 1
+        return elapsed
+
+    def snapshot(self) -> Tuple[int, float]:
+        """
+        Current progress
+
+        Returns:
+            Tuple of (percentage 0-100, estimated seconds remaining)
+        """
+        before = sum(seconds for _, seconds in self.estimates[:self.index])
+        stage_seconds = self.estimates[self.index][1] if self.index < len(self.estimates) else 0.0
+        after = sum(seconds for _, seconds in self.estimates[self.index + 1:])
+
+        elapsed = time.monotonic() - self.stage_started if self.running else 0.0
+        fraction = min(elapsed / stage_seconds, self.STAGE_CAP) if stage_seconds else 0.0
+        percentage = int(100 * (before + fraction * stage_seconds) / self.total)
+        eta_seconds = max(stage_seconds - elapsed, 0.0) + after
+        return percentage, round(eta_seconds, 1)
@@ -0,0 +1,63 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config.settings import settings
+
+class BlockingExecutor:
+    """Managed thread pool for blocking work (file I/O, large string encoding)
+
+    Keeps blocking calls off the event loop thread so one slow call cannot
+    stall every other request and WebSocket.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        self._completed = 0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable in the pool and await its result
+
+        Args:
+            func: Blocking callable
+            *args, **kwargs: Arguments passed to func
+
+        Returns:
+            Whatever func returns
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="blocking"
+            )
+
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        try:
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            self._pending -= 1
+            self._completed += 1
+
+    def shutdown(self):
+        """Stop the pool; a later run() recreates it"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "pending": self._pending,
+            "completed": self._completed
+        }
+
+blocking_executor = BlockingExecutor(settings.blocking_pool_workers)
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the shared blocking executor"""
+    return await blocking_executor.run(func, *args, **kwargs)
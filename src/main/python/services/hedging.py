@@ -0,0 +1,128 @@
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from config.settings import settings
+
+def size_class(size: int) -> str:
+    """Bucket a request size (bytes or characters) into powers of 4"""
+    if size <= 1:
+        return "<=1"
+    return f"<={4 ** math.ceil(math.log(size, 4))}"
+
+class LatencyTracker:
+    """Recent latencies per key (operation and size class)"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self.samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, latency_s: float):
+        self.samples.setdefault(key, deque(maxlen=self.window)).append(latency_s)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """Latency percentile for key, or None until enough samples exist"""
+        samples = self.samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+class RequestHedger:
+    """Issues a duplicate request when the first one is slower than usual
+
+    If a request is still running after the observed p95 latency for its
+    key, a second identical request is started; whichever succeeds first
+    wins and the other is cancelled. Hedges are limited by a budget: at
+    most ``budget_ratio`` of all requests (plus a small burst allowance)
+    may be duplicated, which caps the extra API cost.
+    """
+
+    def __init__(self, enabled: bool, budget_ratio: float, burst: int = 2, quantile: float = 0.95):
+        self.enabled = enabled
+        self.budget_ratio = budget_ratio
+        self.burst = burst
+        self.quantile = quantile
+        self.tracker = LatencyTracker()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    def _acquire_hedge(self) -> bool:
+        if self.hedged < self.requests * self.budget_ratio + self.burst:
+            self.hedged += 1
+            return True
+        self.budget_denied += 1
+        return False
+
+    async def run(self, key: str, request_factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a request, hedging it if it exceeds the p95 latency for key
+
+        Args:
+            key: Latency key, e.g. "whisper:<=4194304"
+            request_factory: Zero-argument callable creating the request coroutine;
+                called a second time for the hedge
+
+        Returns:
+            Result of the first request to succeed
+        """
+        self.requests += 1
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(request_factory())
+        delay = self.tracker.percentile(key, self.quantile) if self.enabled else None
+
+        if delay is None:
+            result = await primary
+            self.tracker.record(key, time.perf_counter() - start)
+            return result
+
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not self._acquire_hedge():
+                result = await primary
+                self.tracker.record(key, time.perf_counter() - start)
+                return result
+
+            hedge_start = time.perf_counter()
+            hedge = asyncio.ensure_future(request_factory())
+            pending = {primary, hedge}
+            first_error: Optional[BaseException] = None
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                            self.tracker.record(key, time.perf_counter() - hedge_start)
+                        else:
+                            self.tracker.record(key, time.perf_counter() - start)
+                        return task.result()
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            # The loser (or both, if we are cancelled) must not keep running
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "budget_ratio": self.budget_ratio,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_denied": self.budget_denied,
+            "p95_s": {
+                key: round(p95, 3)
+                for key in self.tracker.samples
+                if (p95 := self.tracker.percentile(key, self.quantile)) is not None
+            }
+        }
+
+request_hedger = RequestHedger(settings.hedging_enabled, settings.hedge_budget_ratio)
@@ -0,0 +1,151 @@
+import re
+from typing import Any, Dict, List, Optional
+from config.settings import settings
+
+CJK_PATTERN = re.compile(r"[\u3000-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+class ModelRouter:
+    """Chooses the chat model and max_tokens for each summary request
+
+    Inputs:
+    - transcript size (estimated input tokens)
+    - a per-request cost tier ("economy", "balanced", "quality") and
+      optional latency target in seconds
+    - recent observed latency per model (EWMA of seconds per output token)
+
+    Every decision is returned as a plain dict so it can be stored with the
+    session and shown to the user.
+    """
+
+    # Seconds per output token assumed before a model has been observed
+    PRIOR_SECONDS_PER_TOKEN = {"economy": 0.015, "quality": 0.03}
+    # Fixed per-request overhead (network, queueing, prompt processing)
+    BASE_LATENCY_S = 1.0
+    EWMA_ALPHA = 0.3
+
+    def __init__(self):
+        # model -> EWMA seconds per output token
+        self.seconds_per_token: Dict[str, float] = {}
+        self.observations: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def models(self) -> Dict[str, str]:
+        """Configured models by tier"""
+        return {"economy": settings.chatgpt_model, "quality": settings.chatgpt_quality_model}
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token estimate: ~1 token per CJK character, ~4 characters per token otherwise"""
+        cjk = len(CJK_PATTERN.findall(text))
+        return cjk + (len(text) - cjk) // 4
+
+    def plan_max_tokens(self, input_tokens: int) -> int:
+        """Scale the output budget with the transcript, capped by settings.max_tokens"""
+        budget = int(input_tokens * settings.route_output_ratio)
+        return max(settings.route_min_output_tokens, min(budget, settings.max_tokens))
+
+    def predict_latency(self, model: str, tier: str, max_tokens: int) -> float:
+        per_token = self.seconds_per_token.get(model, self.PRIOR_SECONDS_PER_TOKEN[tier])
+        return self.BASE_LATENCY_S + per_token * max_tokens
+
+    def route(
+        self,
+        transcript: str,
+        cost_tier: Optional[str] = None,
+        latency_target_s: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Decide model and max_tokens for a summary request
+
+        Args:
+            transcript: Transcript to summarize
+            cost_tier: "economy", "balanced" or "quality" (defaults to settings)
+            latency_target_s: Optional latency target for the request
+
+        Returns:
+            Routing decision with the chosen model and ordered fallbacks
+        """
+        cost_tier = cost_tier or settings.route_default_cost_tier
+        input_tokens = self.estimate_tokens(transcript)
+        max_tokens = self.plan_max_tokens(input_tokens)
+
+        # Preference order by cost tier and transcript size
+        if cost_tier == "economy":
+            preferred = ["economy"]
+            reason = "economy tier"
+        elif cost_tier == "quality":
+            preferred = ["quality", "economy"]
+            reason = "quality tier"
+        elif input_tokens <= settings.route_quality_max_input_tokens:
+            preferred = ["quality", "economy"]
+            reason = f"short transcript ({input_tokens} tokens) → quality model"
+        else:
+            preferred = ["economy", "quality"]
+            reason = f"long transcript ({input_tokens} tokens) → economy model"
+
+        candidates: List[Dict[str, Any]] = []
+        for tier in preferred:
+            model = self.models[tier]
+            if any(candidate["model"] == model for candidate in candidates):
+                continue
+            candidates.append({
+                "model": model,
+                "tier": tier,
+                "predicted_latency_s": round(self.predict_latency(model, tier, max_tokens), 2)
+            })
+
+        chosen = candidates[0]
+        if latency_target_s is not None:
+            within_target = [c for c in candidates if c["predicted_latency_s"] <= latency_target_s]
+            if within_target:
+                if within_target[0] is not chosen:
+                    reason += f"; {chosen['model']} predicted over {latency_target_s}s target"
+                chosen = within_target[0]
+            else:
+                chosen = min(candidates, key=lambda c: c["predicted_latency_s"])
+                reason += f"; no model meets {latency_target_s}s target, using fastest"
+
+        # Fallbacks on timeout: remaining models, fastest first
+        fallbacks = sorted(
+            (c for c in candidates if c is not chosen),
+            key=lambda c: c["predicted_latency_s"]
+        )
+
+        return {
+            "model": chosen["model"],
+            "max_tokens": max_tokens,
+            "estimated_input_tokens": input_tokens,
+            "cost_tier": cost_tier,
+            "latency_target_s": latency_target_s,
+            "predicted_latency_s": chosen["predicted_latency_s"],
+            "reason": reason,
+            "fallbacks": [c["model"] for c in fallbacks],
+            "attempts": []
+        }
+
+    def observe(self, model: str, latency_s: float, completion_tokens: Optional[int], timed_out: bool = False):
+        """Feed an observed request latency back into the model's estimate"""
+        stats = self.observations.setdefault(model, {"requests": 0, "timeouts": 0})
+        stats["requests"] += 1
+        if timed_out:
+            stats["timeouts"] += 1
+            # Treat a timeout as "at least this slow" for the whole budget
+            completion_tokens = completion_tokens or settings.route_min_output_tokens
+        if not completion_tokens:
+            return
+
+        sample = max(latency_s - self.BASE_LATENCY_S, 0.0) / completion_tokens
+        previous = self.seconds_per_token.get(model)
+        self.seconds_per_token[model] = sample if previous is None else (
+            self.EWMA_ALPHA * sample + (1 - self.EWMA_ALPHA) * previous
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            model: {
+                **self.observations.get(model, {"requests": 0, "timeouts": 0}),
+                "seconds_per_token": round(self.seconds_per_token[model], 5)
+                if model in self.seconds_per_token else None
+            }
+            for model in set(self.models.values()) | set(self.observations)
+        }
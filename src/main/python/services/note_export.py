@@ -0,0 +1,147 @@
+import io
+import os
+import json
+import tarfile
+import zipfile
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# (archive path, file content, modification time)
+ExportNote = Tuple[str, bytes, datetime]
+
+# Written bytes are handed out once at least this much has accumulated
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class _StreamWriter:
+    """Write-only, unseekable file object that buffers bytes until drained"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def stream_zip(notes: Iterable[ExportNote]) -> Iterator[bytes]:
+    """
+    Build a ZIP archive incrementally
+
+    zipfile writes data descriptors when the target cannot seek, so each
+    entry is emitted as soon as it is compressed and only the current note
+    is held in memory.
+
+    Args:
+        notes: Notes to add, consumed lazily
+
+    Yields:
+        Archive bytes
+    """
+    writer = _StreamWriter()
+    with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, content, modified in notes:
+            info = zipfile.ZipInfo(path, date_time=modified.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, content)
+            if len(writer.buffer) >= STREAM_CHUNK_SIZE:
+                yield writer.drain()
+    yield writer.drain()
+
+def stream_tar_gz(notes: Iterable[ExportNote]) -> Iterator[bytes]:
+    """
+    Build a gzip-compressed tar archive incrementally (stream mode "w|gz")
+
+    Args:
+        notes: Notes to add, consumed lazily
+
+    Yields:
+        Archive bytes
+    """
+    writer = _StreamWriter()
+    with tarfile.open(fileobj=writer, mode="w|gz") as archive:
+        for path, content, modified in notes:
+            info = tarfile.TarInfo(path)
+            info.size = len(content)
+            info.mtime = modified.timestamp()
+            archive.addfile(info, io.BytesIO(content))
+            if len(writer.buffer) >= STREAM_CHUNK_SIZE:
+                yield writer.drain()
+    yield writer.drain()
+
+def unique_path(path: str, used: Dict[str, int]) -> str:
+    """Suffix repeated archive paths: "a.md", "a (2).md", ..."""
+    count = used.get(path, 0) + 1
+    used[path] = count
+    if count == 1:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem} ({count}){ext}"
+
+def cursor_key(
+    name: str, start: Optional[date] = None, end: Optional[date] = None, tags: Optional[List[str]] = None
+) -> str:
+    """
+    Cursor name scoped to an export's filters
+
+    A filtered export only moves the cursor of its own filter set, so notes
+    it skipped are still picked up by unfiltered or differently filtered
+    incremental exports.
+
+    Args:
+        name: Cursor name chosen by the client
+        start: Completion date lower bound
+        end: Completion date upper bound
+        tags: Tag filter
+
+    Returns:
+        name itself when no filter is set
+    """
+    filters = {
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "tags": sorted(set(tags)) if tags else None
+    }
+    filters = {key: value for key, value in filters.items() if value}
+    if not filters:
+        return name
+    return f"{name}?{json.dumps(filters, ensure_ascii=False, sort_keys=True)}"
+
+class ExportCursors:
+    """Named "exported up to" timestamps for incremental exports, persisted as JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, name: str) -> Optional[datetime]:
+        value = self._read().get(name)
+        return datetime.fromisoformat(value) if value else None
+
+    def advance(self, name: str, exported_until: datetime):
+        """Move a cursor forward (blocking; never moves it back)"""
+        cursors = self._read()
+        current = cursors.get(name)
+        if current and datetime.fromisoformat(current) >= exported_until:
+            return
+        cursors[name] = exported_until.isoformat()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cursors, f)
+        os.replace(temp_path, self.path)
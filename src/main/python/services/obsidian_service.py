@@ -1,8 +1,12 @@
+import json
 import urllib.parse
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from config.settings import settings
 
+# Tags every generated note carries
+DEFAULT_NOTE_TAGS = ["學術論文", "AI生成摘要", "Podcast筆記"]
+
 class ObsidianService:
     """Service for Obsidian integration via URI scheme"""
     
@@ -12,6 +16,7 @@ class ObsidianService:
         content: str,
         vault_name: Optional[str] = None,
         file_path: Optional[str] = None,
+        tags: Optional[List[str]] = None,
         validate: bool = True
     ) -> str:
         """
@@ -22,6 +27,7 @@ class ObsidianService:
             content: Note content in Markdown
             vault_name: Obsidian vault name (optional)
             file_path: Custom file path within vault (optional)
+            tags: Tags in addition to DEFAULT_NOTE_TAGS (optional)
             validate: Whether to validate Obsidian installation (optional)
             
         Returns:
@@ -37,20 +43,15 @@ class ObsidianService:
         # Use default vault if not specified
         vault = vault_name or settings.default_obsidian_vault
         
-        # Generate file path
-        if file_path:
-            full_path = file_path
-        else:
-            # Use default path with sanitized title
-            sanitized_title = self._sanitize_filename(title)
-            full_path = f"{settings.default_paper_path}/{sanitized_title}"
+        # Generate file path (default path with sanitized title)
+        full_path = file_path or self.note_path(title)
         
         # Add .md extension if not present
         if not full_path.endswith('.md'):
             full_path += '.md'
         
         # Add metadata to content
-        enhanced_content = self._add_metadata(content, title)
+        enhanced_content = self._add_metadata(content, title, tags)
         
         # URL encode parameters
         encoded_vault = urllib.parse.quote(vault)
@@ -62,6 +63,39 @@ class ObsidianService:
         
         return uri
     
+    def note_path(self, title: str) -> str:
+        """
+        Path of a note within the vault
+        
+        Args:
+            title: Paper title
+            
+        Returns:
+            Path under default_paper_path, with .md extension
+        """
+        return f"{settings.default_paper_path}/{self._sanitize_filename(title)}.md"
+    
+    def render_note(
+        self,
+        title: str,
+        content: str,
+        tags: Optional[List[str]] = None,
+        created: Optional[datetime] = None
+    ) -> str:
+        """
+        Render the full Markdown note (frontmatter and body) as saved in the vault
+        
+        Args:
+            title: Paper title
+            content: Note content in Markdown
+            tags: Tags in addition to DEFAULT_NOTE_TAGS
+            created: Creation time shown in the note (defaults to now)
+            
+        Returns:
+            Note Markdown
+        """
+        return self._add_metadata(content, title, tags, created)
+    
     def _sanitize_filename(self, filename: str) -> str:
         """
         Sanitize filename for file system compatibility
@@ -92,19 +126,33 @@ class ObsidianService:
         
         return sanitized or "未命名論文"
     
-    def _add_metadata(self, content: str, title: str) -> str:
+    def _add_metadata(
+        self,
+        content: str,
+        title: str,
+        tags: Optional[List[str]] = None,
+        created: Optional[datetime] = None
+    ) -> str:
         """
         Add YAML frontmatter and metadata to the content
         
         Args:
             content: Original content
             title: Paper title
+            tags: Tags in addition to DEFAULT_NOTE_TAGS (optional)
+            created: Creation time (optional, defaults to now)
             
         Returns:
             Content with metadata
         """
-        # Current timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Creation timestamp
+        timestamp = (created or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        # Tags may come from the model; quote each one (a JSON string is a valid
+        # YAML double-quoted scalar) so ":", "#", "[" or a leading "-" stay text
+        tag_lines = "\n".join(
+            f"  - {json.dumps(tag, ensure_ascii=False)}"
+            for tag in DEFAULT_NOTE_TAGS + [t for t in tags or [] if t.strip() and t not in DEFAULT_NOTE_TAGS]
+        )
         
         # YAML frontmatter
         frontmatter = f"""---
@@ -113,9 +161,7 @@ type: "學術論文筆記"
 created: "{timestamp}"
 source: "Podcast 音檔"
 tags:
-  - 學術論文
-  - AI生成摘要
-  - Podcast筆記
+{tag_lines}
 ---
 
 # {title}
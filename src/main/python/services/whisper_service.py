@@ -1,17 +1,33 @@
+import os
 import openai
-from typing import Optional
+from typing import Any, Optional, Tuple
 from config.settings import settings
+from services.executor import run_blocking
+from services.hedging import request_hedger, size_class
+from services.transcript_segments import TranscriptSegments
+
+# Typical bitrates (kbps) used to guess duration from file size when the
+# audio metadata cannot be read
+FALLBACK_BITRATE_KBPS = {".wav": 1411, ".flac": 800}
+DEFAULT_BITRATE_KBPS = 128
 
 class WhisperService:
     """Service for OpenAI Whisper API integration"""
     
     def __init__(self):
-        if not settings.openai_api_key:
-            raise Exception("OpenAI API key not found. Please check your .env file.")
-        self.client = openai.AsyncOpenAI(
-            api_key=settings.openai_api_key,
-            timeout=60.0  # 60 seconds timeout
-        )
+        self._client = None
+    
+    @property
+    def client(self):
+        """OpenAI client, created on first use so the app can boot without an API key"""
+        if self._client is None:
+            if not settings.openai_api_key:
+                raise Exception("OpenAI API key not found. Please check your .env file.")
+            self._client = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                timeout=60.0  # 60 seconds timeout
+            )
+        return self._client
     
     async def transcribe_audio(
         self, 
@@ -28,6 +44,34 @@ class WhisperService:
         Returns:
             Transcribed text
         """
+        return await self._transcribe(file_path, custom_prompt, "text")
+    
+    async def transcribe_with_segments(
+        self, 
+        file_path: str, 
+        custom_prompt: Optional[str] = None
+    ) -> Tuple[str, TranscriptSegments]:
+        """
+        Transcribe audio file and keep segment timestamps (verbose_json)
+        
+        Args:
+            file_path: Path to the audio file
+            custom_prompt: Optional prompt to help with transcription accuracy
+            
+        Returns:
+            Tuple of (transcribed text, compact timestamped segments)
+        """
+        response = await self._transcribe(file_path, custom_prompt, "verbose_json")
+        segments = getattr(response, "segments", None) or []
+        return response.text, TranscriptSegments.from_whisper(segments)
+    
+    async def _transcribe(
+        self, 
+        file_path: str, 
+        custom_prompt: Optional[str], 
+        response_format: str
+    ) -> Any:
+        """Call the Whisper API and return the raw response for response_format"""
         try:
             # Default academic prompt for better recognition of technical terms
             default_prompt = (
@@ -38,18 +82,27 @@ class WhisperService:
             
             prompt = custom_prompt or default_prompt
             
-            # Read audio file - OpenAI API requires standard file object, not async file
-            with open(file_path, 'rb') as audio_file:
-                # Call Whisper API
-                response = await self.client.audio.transcriptions.create(
-                    model=settings.whisper_model,
-                    file=audio_file,
-                    prompt=prompt,
-                    language="zh",  # Specify Chinese for better accuracy
-                    response_format="text"
-                )
-                
-                return response
+            file_size = await run_blocking(os.path.getsize, file_path)
+            
+            async def attempt():
+                # Each attempt (including a hedge) streams its own file handle,
+                # so the audio is never held in memory as a whole
+                audio_file = await run_blocking(open, file_path, "rb")
+                try:
+                    return await self.client.audio.transcriptions.create(
+                        model=settings.whisper_model,
+                        file=(os.path.basename(file_path), audio_file),
+                        prompt=prompt,
+                        language="zh",  # Specify Chinese for better accuracy
+                        response_format=response_format
+                    )
+                finally:
+                    audio_file.close()
+            
+            # Call Whisper API (hedged if it runs past the p95 for this file size)
+            response = await request_hedger.run(f"whisper:{size_class(file_size)}", attempt)
+            
+            return response
                 
         except openai.APIConnectionError as e:
             raise Exception(f"網路連接失敗，請檢查網路連線: {str(e)}")
@@ -68,8 +121,6 @@ class WhisperService:
         Returns:
             True if file is valid, False otherwise
         """
-        import os
-        
         if not os.path.exists(file_path):
             return False
             
@@ -94,4 +145,22 @@ class WhisperService:
             # If mutagen is not installed, return None
             return None
         except Exception:
-            return None
\ No newline at end of file
+            return None
+    
+    def estimate_audio_duration(self, file_path: str) -> float:
+        """
+        Audio duration in seconds, guessed from the file size if metadata is unavailable
+        
+        Args:
+            file_path: Path to the audio file
+            
+        Returns:
+            Duration in seconds
+        """
+        duration = self.get_audio_duration(file_path)
+        if duration:
+            return duration
+        
+        file_ext = os.path.splitext(file_path)[1].lower()
+        bitrate_kbps = FALLBACK_BITRATE_KBPS.get(file_ext, DEFAULT_BITRATE_KBPS)
+        return os.path.getsize(file_path) * 8 / (bitrate_kbps * 1000)
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import application modules the way main.py does (from src/main/python)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,48 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from services.chatgpt_service import ChatGPTService
+
+def api_error(error_type, status_code):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return error_type("error", response=httpx.Response(status_code, request=request), body=None)
+
+def completion(text):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(completion_tokens=10)
+    )
+
+def summarize_with_first_attempt_failing(error):
+    service = ChatGPTService()
+    calls = []
+
+    async def create_completion(operation, messages, model=None, **kwargs):
+        calls.append((model, kwargs.get("max_retries")))
+        if len(calls) == 1:
+            raise error
+        return completion("summary")
+
+    service._create_completion = create_completion
+    summary, routing = asyncio.run(
+        service.generate_summary_routed("短逐字稿", "標題", cost_tier="quality")
+    )
+    return summary, routing, calls
+
+def test_rate_limit_falls_back_to_next_model():
+    summary, routing, calls = summarize_with_first_attempt_failing(api_error(openai.RateLimitError, 429))
+
+    assert summary == "summary"
+    assert calls[0][1] == 0  # no SDK retries while a fallback exists
+    assert calls[1][1] is None  # the last model keeps the SDK's retries
+    assert routing["fallback_used"]
+    assert routing["attempts"][0]["error"] == "RateLimitError"
+
+def test_server_error_falls_back_to_next_model():
+    summary, routing, _ = summarize_with_first_attempt_failing(api_error(openai.InternalServerError, 503))
+
+    assert summary == "summary"
+    assert routing["final_model"] == routing["fallbacks"][0]
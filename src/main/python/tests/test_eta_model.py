@@ -0,0 +1,29 @@
+from services.eta_model import ThroughputModel
+
+def test_fixed_cost_stage_does_not_scale_with_audio(tmp_path):
+    model = ThroughputModel(str(tmp_path / "eta.json"))
+    # A short clip used to record import as ~25 s per audio-minute
+    model.observe("import", 1.25 / 60, 0.52)
+    model.observe("import", 30, 0.61)
+
+    assert model.estimate("import", 60) < 2
+
+def test_linear_stage_fits_fixed_cost_and_slope(tmp_path):
+    model = ThroughputModel(str(tmp_path / "eta.json"))
+    for minutes in (1, 5, 10, 20, 40, 60):
+        model.observe("transcription", minutes, 3 + 4 * minutes)
+    model.observe("transcription", 10, 500)  # one stalled request
+
+    fixed, slope = model.coefficients("transcription")
+    assert abs(fixed - 3) < 0.5
+    assert abs(slope - 4) < 0.1
+
+def test_observations_survive_restart(tmp_path):
+    path = str(tmp_path / "eta.json")
+    model = ThroughputModel(path)
+    model.observe("summary", 12, 9.0)
+    model.save()
+
+    restored = ThroughputModel(path)
+    restored.load()
+    assert restored.estimate("summary", 90) == model.estimate("summary", 90)
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from services.hedging import RequestHedger, size_class
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+def warmed_hedger(**kwargs) -> RequestHedger:
+    """Hedger whose p95 for "op" is 10 ms"""
+    hedger = RequestHedger(enabled=True, **kwargs)
+    for _ in range(hedger.tracker.min_samples):
+        hedger.tracker.record("op", 0.01)
+    return hedger
+
+class Requests:
+    """Request factory whose calls take the given durations in turn and record their fate"""
+
+    def __init__(self, *durations, fail=()):
+        self.durations = list(durations)
+        self.fail = set(fail)
+        self.started = 0
+        self.cancelled = []
+
+    def __call__(self):
+        attempt = self.started
+        self.started += 1
+        return self._request(attempt, self.durations[attempt])
+
+    async def _request(self, attempt, duration):
+        try:
+            await asyncio.sleep(duration)
+        except asyncio.CancelledError:
+            self.cancelled.append(attempt)
+            raise
+        if attempt in self.fail:
+            raise RuntimeError(f"attempt {attempt} failed")
+        return attempt
+
+def test_no_hedge_without_latency_history():
+    hedger = RequestHedger(enabled=True, budget_ratio=1.0)
+    requests = Requests(0.05)
+    assert run(hedger.run("op", requests)) == 0
+    assert requests.started == 1 and hedger.hedged == 0
+
+def test_slow_request_is_hedged_and_loser_cancelled():
+    async def scenario():
+        hedger = warmed_hedger(budget_ratio=1.0)
+        requests = Requests(1.0, 0.01)
+        assert await hedger.run("op", requests) == 1
+        await asyncio.sleep(0)
+        assert requests.cancelled == [0]
+        assert hedger.hedged == 1 and hedger.hedge_wins == 1
+
+    run(scenario())
+
+def test_failed_attempt_falls_back_to_the_other():
+    hedger = warmed_hedger(budget_ratio=1.0)
+    requests = Requests(0.05, 0.01, fail={1})
+    assert run(hedger.run("op", requests)) == 0
+    assert hedger.hedged == 1 and hedger.hedge_wins == 0
+
+def test_budget_limits_hedges():
+    async def scenario():
+        hedger = warmed_hedger(budget_ratio=0.0, burst=1)
+        first, second = Requests(0.05, 0.01), Requests(0.05, 0.01)
+        assert await hedger.run("op", first) == 1
+        # The burst allowance is spent; the slow request is simply awaited
+        assert await hedger.run("op", second) == 0
+        assert second.started == 1
+        assert hedger.hedged == 1 and hedger.budget_denied == 1
+
+    run(scenario())
+
+def test_cancelling_the_caller_cancels_both_attempts():
+    async def scenario():
+        hedger = warmed_hedger(budget_ratio=1.0)
+        requests = Requests(1.0, 1.0)
+        caller = asyncio.create_task(hedger.run("op", requests))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        assert sorted(requests.cancelled) == [0, 1]
+
+    run(scenario())
+
+def test_size_class_buckets_by_powers_of_four():
+    assert size_class(1) == "<=1"
+    assert size_class(4) == "<=4"
+    assert size_class(5) == "<=16"
+    assert size_class(4 ** 9 + 1) == f"<={4 ** 10}"
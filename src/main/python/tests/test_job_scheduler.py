@@ -0,0 +1,156 @@
+import asyncio
+
+from api.job_scheduler import JobScheduler
+from models.schemas import JobPriority
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+def test_stop_with_running_job_returns():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1)
+        await scheduler.start()
+        started = asyncio.Event()
+
+        async def job():
+            started.set()
+            await asyncio.sleep(60)
+
+        scheduler.submit("running", job)
+        await started.wait()
+        await asyncio.wait_for(scheduler.stop(), timeout=1)
+        assert not scheduler.is_active("running")
+
+    run(scenario())
+
+def test_cancelled_running_job_keeps_worker_alive():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1)
+        await scheduler.start()
+        started = asyncio.Event()
+        finished = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(60)
+
+        async def fast():
+            finished.set()
+
+        scheduler.submit("slow", slow)
+        scheduler.submit("fast", fast)
+        await started.wait()
+        assert scheduler.cancel("slow") == "running"
+        await asyncio.wait_for(finished.wait(), timeout=1)
+        await scheduler.stop()
+
+    run(scenario())
+
+def test_interactive_jobs_start_before_batch_jobs():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1)
+        await scheduler.start()
+        gate = asyncio.Event()
+        order = []
+
+        async def blocker():
+            await gate.wait()
+
+        def record(name):
+            async def job():
+                order.append(name)
+            return job
+
+        scheduler.submit("blocker", blocker)
+        await asyncio.sleep(0)
+        scheduler.submit("batch", record("batch"), JobPriority.BATCH)
+        scheduler.submit("interactive", record("interactive"), JobPriority.INTERACTIVE)
+        assert scheduler.queue_position("interactive") == 1
+        assert scheduler.queue_position("batch") == 2
+
+        gate.set()
+        while len(order) < 2:
+            await asyncio.sleep(0.01)
+        assert order == ["interactive", "batch"]
+        await scheduler.stop()
+
+    run(scenario())
+
+def test_cancel_queued_job_skips_it():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1)
+        await scheduler.start()
+        gate = asyncio.Event()
+        ran = []
+
+        async def blocker():
+            await gate.wait()
+
+        async def job():
+            ran.append("queued")
+
+        scheduler.submit("blocker", blocker)
+        scheduler.submit("queued", job)
+        assert scheduler.cancel("queued") == "queued"
+        assert scheduler.queue_position("queued") is None
+
+        gate.set()
+        await asyncio.sleep(0.05)
+        assert ran == []
+        await scheduler.stop()
+
+    run(scenario())
+
+def test_raise_priority_moves_queued_job_ahead():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1)
+        await scheduler.start()
+        release = asyncio.Event()
+        order = []
+
+        async def blocker():
+            await release.wait()
+
+        def job(name):
+            async def run_job():
+                order.append(name)
+            return run_job
+
+        scheduler.submit("blocker", blocker)
+        await asyncio.sleep(0)
+        scheduler.submit("first", job("first"))
+        scheduler.submit("shared", job("shared"), JobPriority.BATCH)
+        assert scheduler.queue_position("shared") == 2
+
+        assert scheduler.raise_priority("shared", JobPriority.INTERACTIVE)
+        assert not scheduler.raise_priority("shared", JobPriority.BATCH)
+        assert scheduler.queue_position("shared") == 2  # keeps its submission order
+        scheduler.submit("later", job("later"))
+
+        release.set()
+        while len(order) < 3:
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+        assert order == ["first", "shared", "later"]
+        assert scheduler.stats()["queued"] == {"interactive": 0, "batch": 0}
+
+    run(scenario())
+
+def test_stop_returns_when_job_swallows_cancellation():
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1)
+        await scheduler.start()
+        started = asyncio.Event()
+
+        async def stubborn_job():
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                return  # e.g. a failure reported instead of the cancellation
+
+        scheduler.submit("stubborn", stubborn_job)
+        await started.wait()
+        await asyncio.wait_for(scheduler.stop(), timeout=1)
+
+    run(scenario())
@@ -0,0 +1,83 @@
+import io
+import os
+import tarfile
+import zipfile
+from datetime import date, datetime
+
+import pytest
+
+from services.note_export import (
+    ExportCursors, STREAM_CHUNK_SIZE, cursor_key, stream_tar_gz, stream_zip, unique_path
+)
+
+MODIFIED = datetime(2024, 3, 1, 12, 30, 10)
+NOTES = [
+    ("notes/注意力機制.md", "---\ntags: [\"NLP\"]\n---\n摘要內容".encode("utf-8"), MODIFIED),
+    ("notes/empty.md", b"", MODIFIED),
+]
+
+def tracked(notes, consumed):
+    for note in notes:
+        consumed.append(note[0])
+        yield note
+
+def large_notes(count):
+    # Incompressible content so every note pushes the archive past a chunk
+    return [(f"n{index}.md", os.urandom(STREAM_CHUNK_SIZE), MODIFIED) for index in range(count)]
+
+@pytest.mark.parametrize("stream", [stream_zip, stream_tar_gz])
+def test_archive_is_streamed_while_notes_are_consumed(stream):
+    consumed = []
+    chunks = stream(tracked(large_notes(5), consumed))
+    first = next(chunks)
+    assert len(first) >= STREAM_CHUNK_SIZE
+    # The compressor may hold back some bytes, but never the whole export
+    assert len(consumed) < 5
+    assert len(first + b"".join(chunks)) > 5 * STREAM_CHUNK_SIZE
+    assert len(consumed) == 5
+
+def test_zip_round_trip():
+    data = b"".join(stream_zip(iter(NOTES)))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == [path for path, _, _ in NOTES]
+        for path, content, _ in NOTES:
+            assert archive.read(path) == content
+        assert archive.getinfo(NOTES[0][0]).date_time == (2024, 3, 1, 12, 30, 10)
+
+def test_tar_gz_round_trip():
+    data = b"".join(stream_tar_gz(iter(NOTES)))
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+        assert archive.getnames() == [path for path, _, _ in NOTES]
+        for path, content, _ in NOTES:
+            assert archive.extractfile(path).read() == content
+        assert archive.getmember(NOTES[0][0]).mtime == int(MODIFIED.timestamp())
+
+def test_empty_export_is_a_valid_archive():
+    with zipfile.ZipFile(io.BytesIO(b"".join(stream_zip([])))) as archive:
+        assert archive.namelist() == []
+
+def test_cursor_key_is_scoped_to_filters():
+    assert cursor_key("obsidian") == "obsidian"
+    assert cursor_key("obsidian", tags=[]) == "obsidian"
+
+    by_tags = cursor_key("obsidian", tags=["NLP", "語音", "NLP"])
+    assert by_tags == cursor_key("obsidian", tags=["語音", "NLP"])
+    assert by_tags != cursor_key("obsidian", tags=["NLP"])
+    assert by_tags.startswith("obsidian?")
+
+    dated = cursor_key("obsidian", start=date(2024, 1, 1), end=date(2024, 2, 1))
+    assert dated != cursor_key("obsidian", start=date(2024, 1, 1))
+    assert "2024-02-01" in dated
+
+def test_unique_path_suffixes_repeats():
+    used = {}
+    assert [unique_path(path, used) for path in ("a.md", "a.md", "b.md", "a.md")] == [
+        "a.md", "a (2).md", "b.md", "a (3).md"
+    ]
+
+def test_cursor_never_moves_back(tmp_path):
+    cursors = ExportCursors(str(tmp_path / "cursors" / "export.json"))
+    assert cursors.get("obsidian") is None
+    cursors.advance("obsidian", MODIFIED)
+    cursors.advance("obsidian", datetime(2024, 1, 1))
+    assert cursors.get("obsidian") == MODIFIED
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+import pytest
+
+from services.obsidian_service import DEFAULT_NOTE_TAGS, ObsidianService
+
+yaml = pytest.importorskip("yaml")
+
+def frontmatter(note: str) -> dict:
+    return yaml.safe_load(note.split("---\n")[1])
+
+def test_generated_tags_stay_strings_in_frontmatter():
+    tags = ["a: b", "#標題", "[list]", "- dash", '引號"', "   "]
+    note = ObsidianService().render_note("論文", "摘要", tags, datetime(2026, 1, 2, 3, 4, 5))
+
+    assert frontmatter(note)["tags"] == DEFAULT_NOTE_TAGS + tags[:5]
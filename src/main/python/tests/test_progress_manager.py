@@ -0,0 +1,22 @@
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from api.progress_manager import ProgressManager
+
+def test_refused_connection_closes_with_try_again_later():
+    progress_manager = ProgressManager(max_connections_per_ip=0)
+    app = FastAPI()
+
+    @app.websocket("/ws/{session_id}")
+    async def endpoint(websocket: WebSocket, session_id: str):
+        await progress_manager.connect(websocket, session_id)
+
+    with TestClient(app) as client:
+        # A close before the handshake would fail here (servers answer it with HTTP 403)
+        with client.websocket_connect("/ws/s") as websocket:
+            with pytest.raises(WebSocketDisconnect) as refused:
+                websocket.receive_text()
+    assert refused.value.code == 1013
+    assert progress_manager.rejected == 1
@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+from api.state_store import MemoryStateStore, SQLiteStateStore
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def factory():
+        if request.param == "memory":
+            return MemoryStateStore()
+        return SQLiteStateStore(str(tmp_path / "state.db"))
+    return factory
+
+def test_progress_updates_keep_content_version(make_store):
+    async def scenario():
+        store = make_store()
+        await store.create("s", {"status": "pending"})
+        await store.update("s", {"progress": 10, "message": "tick"})
+        await store.update("s", {"progress": 20, "message": "tick"})
+        session = await store.get("s")
+        assert session["version"] == 3
+        assert session["content_version"] == 1
+
+        await store.update("s", {"summary": "done", "progress": 100})
+        session = await store.get("s")
+        assert session["version"] == 4
+        assert session["content_version"] == 2
+
+    run(scenario())
+
+def test_get_field_reads_one_field(make_store):
+    async def scenario():
+        store = make_store()
+        await store.create("s", {"paper_title": "t", "summary": "摘要", "tags": ["a"]})
+        assert await store.get_field("s", "summary") == "摘要"
+        assert await store.get_field("s", "tags") == ["a"]
+        assert await store.get_field("s", "transcript") is None
+        assert await store.get_field("missing", "summary") is None
+
+        # Listing without large fields still carries the metadata used for filtering
+        (session_id, data), = await store.items(include_large=False)
+        assert session_id == "s" and data["tags"] == ["a"]
+
+    run(scenario())
+
+def test_only_one_concurrent_claim_succeeds(make_store):
+    async def scenario():
+        store = make_store()
+        await store.create("s", {"status": "pending"})
+        claims = await asyncio.gather(*(
+            store.update_if_status("s", ["pending", "completed"], {"status": "queued", "by": n})
+            for n in range(5)
+        ))
+        assert claims.count(True) == 1
+        assert (await store.get("s"))["status"] == "queued"
+        assert not await store.update_if_status("missing", ["pending"], {"status": "queued"})
+
+    run(scenario())
+
+def test_claim_is_atomic_across_workers(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "state.db")
+        workers = [SQLiteStateStore(path) for _ in range(3)]
+        await workers[0].create("s", {"status": "pending"})
+        claims = await asyncio.gather(*(
+            worker.update_if_status("s", ["pending"], {"status": "queued"}) for worker in workers
+        ))
+        assert claims.count(True) == 1
+
+    run(scenario())
+
+def test_flight_lifecycle(make_store):
+    async def scenario():
+        store = make_store()
+        assert await store.join_flight("k", "a") is None
+        assert await store.join_flight("k", "b") == "a"
+        assert await store.join_flight("k", "c") == "a"
+        assert await store.flight_sessions("a") == ["a", "b", "c"]
+        assert await store.flight_of("b") == "a"
+
+        # Members detach while others remain; the last one must cancel the job
+        assert await store.leave_flight("b")
+        assert await store.leave_flight("a")
+        assert not await store.leave_flight("c")
+        assert not await store.leave_flight("unknown")
+
+        await store.finish_flight("a")
+        assert await store.flight_sessions("a") == []
+        assert await store.join_flight("k", "d") is None
+
+    run(scenario())
+
+def test_flights_are_shared_across_workers(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "state.db")
+        owner, other = SQLiteStateStore(path), SQLiteStateStore(path)
+        joins = await asyncio.gather(owner.join_flight("k", "a"), other.join_flight("k", "b"))
+        # Exactly one worker starts the flight; the other attaches to its job
+        job_id = "a" if joins[0] is None else "b"
+        assert joins == ([None, "a"] if job_id == "a" else ["b", None])
+        assert await owner.flight_sessions(job_id) == await other.flight_sessions(job_id)
+        assert await other.flight_counts() == (1, 2)
+
+        await owner.finish_flight(job_id)
+        assert await other.flight_of("b") is None
+
+    run(scenario())
+
+def test_concurrent_updates_from_workers_are_not_lost(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "state.db")
+        workers = [SQLiteStateStore(path) for _ in range(3)]
+        await workers[0].create("s", {"status": "processing"})
+        await asyncio.gather(*(
+            worker.update("s", {f"w{index}-{n}": n, "transcript": f"{index}-{n}"})
+            for index, worker in enumerate(workers) for n in range(10)
+        ))
+        session = await workers[1].get("s")
+        # Every read-modify-write saw the previous one: no field and no version bump lost
+        assert all(session[f"w{index}-{n}"] == n for index in range(3) for n in range(10))
+        assert session["version"] == 31
+        assert session["content_version"] == 31
+
+    run(scenario())
+
+def collect(events):
+    async def callback(session_id, kind, payload):
+        events.append((session_id, kind, payload))
+    return callback
+
+def test_events_reach_other_workers_once(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "state.db")
+        publisher = SQLiteStateStore(path, poll_interval=0.01)
+        await publisher.publish("old", "progress", {"n": 0})
+
+        subscriber = SQLiteStateStore(path, poll_interval=0.01)
+        local, remote = [], []
+        publisher.subscribe(collect(local))
+        subscriber.subscribe(collect(remote))
+        await publisher.start()
+        await subscriber.start()
+        try:
+            await publisher.publish("s", "progress", {"n": 1})
+            await publisher.publish("s", "control", {"action": "cancel"})
+            while len(remote) < 2:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+        finally:
+            await publisher.stop()
+            await subscriber.stop()
+
+        expected = [("s", "progress", {"n": 1}), ("s", "control", {"action": "cancel"})]
+        # The publisher gets its own events immediately and does not replay them from the table;
+        # events published before a worker started are not delivered to it
+        assert local == expected
+        assert remote == expected
+
+    run(scenario())
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from api.state_store import MemoryStateStore
+from api.storage_manager import StorageManager, StorageQuotaError
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+def write(path, size, age=0.0):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+    return str(path)
+
+def test_eviction_skips_pinned_and_partial_files(tmp_path):
+    async def scenario():
+        manager = StorageManager(str(tmp_path), quota_bytes=300, pins=MemoryStateStore())
+        oldest = write(tmp_path / "oldest.mp3", 100)
+        pinned = write(tmp_path / "pinned.mp3", 100)
+        newest = write(tmp_path / "newest.mp3", 50)
+        for path in (pinned, oldest, newest):
+            manager.register(path)
+        await manager.pin(pinned)
+        # Least recently used first: pinned, then oldest
+        manager.files[pinned]["last_access"] -= 200
+        manager.files[oldest]["last_access"] -= 100
+        # A resumable upload reserves its declared size before any bytes arrive
+        manager.register(os.path.join(manager.partial_dir, "upload.part"), size=40)
+
+        await manager.ensure_capacity(60)
+
+        assert not os.path.exists(oldest)
+        assert os.path.exists(pinned) and os.path.exists(newest)
+        assert manager.used_bytes == 190
+        assert manager.stats()["evicted"] == 1
+
+        with pytest.raises(StorageQuotaError):
+            await manager.ensure_capacity(200)  # Only pinned and partial bytes would remain
+        with pytest.raises(StorageQuotaError):
+            await manager.ensure_capacity(301)
+
+    run(scenario())
+
+def test_sweep_removes_orphans_expired_and_stale_partials(tmp_path):
+    async def scenario():
+        manager = StorageManager(
+            str(tmp_path), quota_bytes=10_000, pins=MemoryStateStore(),
+            partial_ttl_seconds=3600, orphan_grace_seconds=300
+        )
+        os.makedirs(manager.partial_dir)
+        live = write(tmp_path / "live.mp3", 10, age=1000)
+        expired = write(tmp_path / "expired.mp3", 10, age=1000)
+        orphan = write(tmp_path / "orphan.mp3", 10, age=1000)
+        fresh_orphan = write(tmp_path / "fresh.mp3", 10)  # Upload whose session is not written yet
+        pinned_orphan = write(tmp_path / "pinned.mp3", 10, age=1000)
+        stale_part = write(tmp_path / ".partial" / "old.part", 10, age=7200)
+        write(tmp_path / ".partial" / "old.json", 2, age=7200)
+        active_part = write(tmp_path / ".partial" / "new.part", 10)
+        manager.register(active_part, size=500)
+        await manager.pin(pinned_orphan)
+
+        await manager.sweep({live: None, expired: time.time() - 1})
+
+        remaining = {os.path.basename(path) for path in manager.files}
+        assert remaining == {"live.mp3", "fresh.mp3", "pinned.mp3", "new.part"}
+        for path in (expired, orphan, stale_part):
+            assert not os.path.exists(path)
+        assert not os.path.exists(tmp_path / ".partial" / "old.json")
+        # Partial uploads keep the size they reserved, not what has arrived so far
+        assert manager.files[active_part]["size"] == 500
+        assert manager.stats()["expired"] == 1
+        assert manager.stats()["orphans_removed"] == 1
+
+    run(scenario())
@@ -0,0 +1,41 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from services.transcript_segments import TranscriptSegments
+
+WHISPER_SEGMENTS = [
+    {"start": 0.0, "end": 2.5, "text": " 大家好，"},
+    {"start": 2.5, "end": 6.0, "text": "今天介紹這篇論文。 "},
+    SimpleNamespace(start=6.0, end=9.25, text="Transformer 架構"),
+    {"start": 9.25, "end": 12.0, "text": None},
+]
+
+def test_from_whisper_keeps_segment_texts_and_times():
+    segments = TranscriptSegments.from_whisper(WHISPER_SEGMENTS)
+    assert len(segments) == 4
+    assert segments[0] == {"index": 0, "start": 0.0, "end": 2.5, "text": "大家好，"}
+    assert segments[2]["text"] == "Transformer 架構"
+    assert segments[-1] == {"index": 3, "start": 9.25, "end": 12.0, "text": ""}
+    assert segments.duration == 12.0
+    with pytest.raises(IndexError):
+        segments[4]
+
+def test_time_range_returns_overlapping_segments():
+    segments = TranscriptSegments.from_whisper(WHISPER_SEGMENTS)
+    indices = lambda start, end: [segment["index"] for segment in segments.time_range(start, end)]
+
+    assert indices(0, 12) == [0, 1, 2, 3]
+    assert indices(3, 7) == [1, 2]
+    # The window is half-open: a segment ending at start or starting at end is outside it
+    assert indices(2.5, 6.0) == [1]
+    assert indices(6.0, 6.0) == []
+    assert indices(12, 20) == []
+    assert TranscriptSegments().time_range(0, 10) == []
+
+def test_dict_round_trip_survives_json():
+    segments = TranscriptSegments.from_whisper(WHISPER_SEGMENTS)
+    restored = TranscriptSegments.from_dict(json.loads(json.dumps(segments.to_dict())))
+    assert [restored[index] for index in range(len(restored))] == [segments[index] for index in range(len(segments))]
+    assert restored.text == segments.text
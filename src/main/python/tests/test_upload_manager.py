@@ -0,0 +1,75 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from api.upload_manager import UploadManager, UploadNotFoundError, UploadOffsetError
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+async def body(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+async def interrupted(chunk):
+    yield chunk
+    raise ConnectionError("client went away")
+
+CONTENT = bytes(range(256)) * 40
+
+def test_interrupted_upload_resumes_from_disk_offset(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload_id = manager.create_upload("talk.MP3", len(CONTENT))["upload_id"]
+
+        assert await manager.append_chunk(upload_id, 0, body(CONTENT[:1000], CONTENT[1000:3000])) == 3000
+        with pytest.raises(ConnectionError):
+            await manager.append_chunk(upload_id, 3000, interrupted(CONTENT[3000:4000]))
+        # The bytes that reached the disk before the failure count
+        assert manager.get_upload(upload_id)["offset"] == 4000
+
+        with pytest.raises(UploadOffsetError) as mismatch:
+            await manager.append_chunk(upload_id, 3000, body(CONTENT[3000:]))
+        assert mismatch.value.expected == 4000
+
+        assert await manager.append_chunk(upload_id, 4000, body(CONTENT[4000:])) == len(CONTENT)
+        destination = str(tmp_path / "talk.mp3")
+        metadata = await manager.finalize(upload_id, destination)
+
+        assert metadata["file_ext"] == ".mp3"
+        assert metadata["content_sha256"] == hashlib.sha256(CONTENT).hexdigest()
+        assert open(destination, "rb").read() == CONTENT
+        with pytest.raises(UploadNotFoundError):
+            manager.get_upload(upload_id)
+
+    run(scenario())
+
+def test_hash_catches_up_after_restart(tmp_path):
+    async def scenario():
+        upload_id = UploadManager(str(tmp_path)).create_upload("talk.wav", len(CONTENT))["upload_id"]
+        first = UploadManager(str(tmp_path))
+        await first.append_chunk(upload_id, 0, body(CONTENT[:2500]))
+
+        # A new process has no running hash and rebuilds it from the part file
+        restarted = UploadManager(str(tmp_path))
+        await restarted.append_chunk(upload_id, 2500, body(CONTENT[2500:]))
+        metadata = await restarted.finalize(upload_id, str(tmp_path / "talk.wav"))
+        assert metadata["content_sha256"] == hashlib.sha256(CONTENT).hexdigest()
+
+    run(scenario())
+
+def test_rejects_overflow_and_early_finalize(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload_id = manager.create_upload("talk.m4a", 10)["upload_id"]
+        with pytest.raises(ValueError):
+            await manager.append_chunk(upload_id, 0, body(b"12345", b"678901"))
+        assert manager.get_upload(upload_id)["offset"] == 5
+
+        with pytest.raises(UploadOffsetError):
+            await manager.finalize(upload_id, str(tmp_path / "talk.m4a"))
+        with pytest.raises(UploadNotFoundError):
+            manager.get_upload("../../etc/passwd")
+
+    run(scenario())